@@ -0,0 +1,54 @@
+"""
+Aquecimento do cache de compilação dos kernels.
+
+Todos os kernels têm assinaturas explícitas e são compilados ao importar
+a ``lib``, então basta importá-la uma vez para que as próximas execuções
+só carreguem o código já compilado. Com `--cache`, o cache fica em um
+diretório escolhido, que pode ser copiado junto da aplicação (por exemplo,
+numa imagem de container) e usado com `NUMBA_CACHE_DIR` nas execuções.
+"""
+import sys, os, time
+from argparse import ArgumentParser
+
+
+# parser de argumentos
+description = 'Compila e grava no cache todos os kernels do Numba.'
+parser = ArgumentParser(description=description, allow_abbrev=False)
+parser.add_argument('-c', '--cache', metavar='DIR', type=str,
+                    help='diretório do cache, o mesmo deve ir em NUMBA_CACHE_DIR nas execuções '
+                         '(PADRÃO: NUMBA_CACHE_DIR ou o __pycache__ da lib)')
+parser.add_argument('--generico', action='store_true',
+                    help='compila para uma CPU genérica, para usar o cache em outras máquinas; '
+                         'as execuções também precisam de NUMBA_CPU_NAME=generic')
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    # precisa estar no ambiente antes de importar o Numba
+    if args.cache is not None:
+        os.environ['NUMBA_CACHE_DIR'] = os.path.abspath(args.cache)
+    if args.generico:
+        os.environ['NUMBA_CPU_NAME'] = 'generic'
+
+    inicio = time.perf_counter()
+    import lib
+    total = time.perf_counter() - inicio
+
+    if not lib.USANDO_NUMBA:
+        print('Numba não encontrado, não há o que compilar', file=sys.stderr)
+        sys.exit(1)
+
+    from lib.perfil import kernels
+    compilados = carregados = 0
+    for nome, kernel in kernels():
+        # sem cache, nenhum dos dois é contado
+        acertos = sum(kernel.stats.cache_hits.values())
+        falhas = sum(kernel.stats.cache_misses.values())
+        compilados += falhas
+        carregados += acertos
+        estado = 'compilado' if falhas else 'no cache' if acertos else 'sem cache'
+        print(f'{nome:40s} {estado}')
+
+    from numba.core.config import CACHE_DIR
+    print(f'{compilados} compilados, {carregados} carregados do cache em {total:.2f} s', file=sys.stderr)
+    print(f'cache: {CACHE_DIR or "__pycache__ da lib"}', file=sys.stderr)
@@ -0,0 +1,124 @@
+"""
+Medição de desempenho dos kernels de pontilhado.
+"""
+from typing import Any, Dict, Optional
+import os, sys, time, threading
+from argparse import ArgumentParser
+import cv2
+import numpy as np
+
+from inout import imgread
+from lib import meios_tons, Varredura, USANDO_NUMBA
+from lib.paletas import BINARIA
+import lib.paletas as paletas
+from dists import ERR_DIST, DISTRIBUICOES, MAPAS, por_nome
+
+
+def rss() -> Optional[int]:
+    """
+    Memória residente atual do processo, em bytes. Apenas no Linux.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Pico:
+    """
+    Maior aumento da memória residente durante o bloco, amostrada por uma
+    thread. Os kernels liberam a GIL, então a amostragem continua durante a
+    execução. Sem o `/proc`, o resultado é `None`.
+    """
+    def __init__(self, intervalo: float=0.001):
+        self.intervalo = intervalo
+        self.bytes: Optional[int] = None
+
+    def __enter__(self) -> 'Pico':
+        self.inicial = self.maximo = rss()
+        self.parar = threading.Event()
+        self.thread = threading.Thread(target=self.amostra, daemon=True)
+        if self.inicial is not None:
+            self.thread.start()
+        return self
+
+    def amostra(self) -> None:
+        while not self.parar.wait(self.intervalo):
+            self.maximo = max(self.maximo, rss() or 0)
+
+    def __exit__(self, *_) -> None:
+        self.parar.set()
+        if self.inicial is not None:
+            self.thread.join()
+            self.maximo = max(self.maximo, rss() or 0)
+            self.bytes = self.maximo - self.inicial
+
+
+def mede(aplica, repeticoes: int) -> Dict[str, Any]:
+    """
+    Melhor tempo, mediana e pico de memória de uma aplicação. A primeira
+    execução, que pode incluir a compilação ou a geração do mapa de
+    limiares, é usada só para a memória e descartada nos tempos.
+    """
+    with Pico() as pico:
+        aplica()
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        aplica()
+        tempos.append(time.perf_counter() - inicio)
+    return {'melhor_s': min(tempos), 'mediana_s': float(np.median(tempos)), 'memoria_pico': pico.bytes}
+
+
+# parser de argumentos
+description = 'Vazão dos kernels de meios-tons, em megapixels por segundo.'
+parser = ArgumentParser(description=description, allow_abbrev=False)
+parser.add_argument('input', metavar='INPUT', type=str, nargs='?', default='imagens/baboon.png',
+                    help='imagem base (PADRÃO: imagens/baboon.png)')
+parser.add_argument('-t', '--tamanho', metavar='N', type=int, default=2048,
+                    help='lado da imagem, redimensionada a partir da base (PADRÃO: 2048)')
+parser.add_argument('-r', '--repeticoes', metavar='N', type=int, default=3,
+                    help='repetições de cada medida, usando a melhor (PADRÃO: 3)')
+parser.add_argument('-g', '--grayscale', dest='modo', action='store_const',
+                    default=cv2.IMREAD_COLOR, const=cv2.IMREAD_GRAYSCALE,
+                    help='mede em escala de cinza')
+parser.add_argument('-q', '--quantizacao', dest='paleta', metavar='PALETA', type=paletas.por_nome,
+                    default=BINARIA, help='níveis por canal ou paleta de cores, como no main.py (PADRÃO: 2)')
+parser.add_argument('-n', '--ns', action='store_true',
+                    help='custo em nanossegundos por pixel, em vez da vazão')
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if not USANDO_NUMBA:
+        print('aviso: executando sem o Numba', file=sys.stderr)
+
+    img = imgread(args.input, args.modo)
+    img = cv2.resize(img, (args.tamanho, args.tamanho), interpolation=cv2.INTER_LINEAR)
+    pixels = args.tamanho * args.tamanho
+
+    # vazão em MP/s ou custo em ns/pixel
+    unidade = 'ns/pixel' if args.ns else 'MP/s'
+    taxa = (lambda seg: seg / pixels * 1e9) if args.ns else (lambda seg: pixels / seg / 1e6)
+
+    nomes = [nome.split('_')[0].lower() for nome in DISTRIBUICOES]
+    print(f'{unidade:14s}', ' '.join(f'{nome:>9s}' for nome in nomes))
+    for varredura in Varredura:
+        taxas = []
+        for nome in DISTRIBUICOES:
+            medida = mede(lambda: meios_tons(img, ERR_DIST[nome], varredura, paleta=args.paleta),
+                          args.repeticoes)
+            taxas.append(taxa(medida['melhor_s']))
+        print(f'{varredura.name:14s}', ' '.join(f'{t:9.1f}' for t in taxas), flush=True)
+
+    # pontilhado ordenado, independente da varredura e só com dois níveis
+    if args.paleta is not BINARIA:
+        sys.exit(0)
+    nomes = [nome.lower() for nome in MAPAS]
+    print(f'{"ordenado":14s}', ' '.join(f'{nome:>9s}' for nome in nomes))
+    taxas = [taxa(mede(lambda: meios_tons(img, por_nome(nome), Varredura.unidirecional),
+                       args.repeticoes)['melhor_s'])
+             for nome in MAPAS]
+    print(f'{unidade:14s}', ' '.join(f'{t:9.1f}' for t in taxas), flush=True)
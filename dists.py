@@ -1,9 +1,10 @@
 """
 Definição das ditribuições de erro para o trabalho 2.
 """
-from typing import Dict, List
+from typing import Dict, List, Union
 from tipos import ErrorDist
 import numpy as np
+from lib.limiares import MAPAS, Mapa, mapa_limiares, ordenado
 
 
 # # # # # # # # # #
@@ -11,6 +12,8 @@ import numpy as np
 
 # Dicinário para acesso por nome.
 ERR_DIST: Dict[str, ErrorDist] = {}
+# Nomes completos das distribuições, em ordem de definição.
+DISTRIBUICOES: List[str] = []
 
 
 def distribuicao(nome: str, total: int, data: List[List[int]]) -> None:
@@ -36,6 +39,7 @@ def distribuicao(nome: str, total: int, data: List[List[int]]) -> None:
     dist = np.asarray(data, dtype=np.float32, order='C')
 
     # insere a dstribuição em cada um dos seus nomes
+    DISTRIBUICOES.append(nome)
     ERR_DIST[nome] = dist
     for nome in nome.split('_'):
         ERR_DIST[nome] = dist
@@ -78,3 +82,33 @@ distribuicao('JARVIS_JUDICE_NINKE', 48, [
     [3, 5, 7, 5, 3],
     [1, 3, 5, 3, 1]
 ])
+
+
+# # # # # # # # # # # # # # # # # # # #
+# Mapas de limiares (sem difusão)     #
+
+def por_nome(nome: str) -> Union[ErrorDist, Mapa]:
+    """
+    Distribuição de erros ou mapa de limiares do pontilhado ordenado (ver
+    ``lib.limiares``), pelo nome. Os mapas são gerados no primeiro uso e
+    vêm em um ``Mapa``.
+
+    Erro
+    ----
+    KeyError
+        Quando não existe distribuição nem mapa com esse nome.
+    """
+    nome = nome.upper()
+    if nome in MAPAS:
+        return mapa_limiares(nome)
+    return ERR_DIST[nome]
+
+
+def nome_de(dist: Union[ErrorDist, Mapa]) -> str:
+    """
+    Nome completo de uma distribuição ou mapa de ``por_nome``, o inverso
+    dela. Outras matrizes não têm nome e resultam em uma string vazia.
+    """
+    if ordenado(dist):
+        return dist.nome
+    return next((nome for nome in DISTRIBUICOES if ERR_DIST[nome] is dist), '')
@@ -0,0 +1,157 @@
+"""
+Aplicação de meios-tons em fluxo, faixa a faixa, para imagens que não
+cabem na memória.
+"""
+from typing import BinaryIO, List
+import os
+from contextlib import ExitStack
+import numpy as np
+
+from tipos import Image, ErrorDist
+from inout import EXT_PNM, pnm_le_cabecalho, pnm_cabecalho, pnm_cinza
+from lib import Varredura, ordenado
+from lib.paletas import Paleta, BINARIA, em_rgb
+from lib.esparsa import pesos_esparsos, margens
+from lib.horizontal import anel_inicial, difunde_linhas
+
+
+# altura padrão das faixas lidas e escritas
+LINHAS = 256
+# extensões que fixam o número de canais da saída, `.pnm` aceita os dois
+CANAIS_PNM = {'.pgm': 1, '.ppm': 3}
+
+
+def le_faixa(arquivo: BinaryIO, linhas: int, largura: int, canais: int, cinza: bool) -> Image:
+    """
+    Lê as próximas linhas de um arquivo PNM.
+
+    Parâmetros
+    ----------
+    arquivo: arquivo binário
+        Arquivo posicionado no início da próxima linha.
+    linhas, largura, canais: int
+        Dimensões da faixa no arquivo.
+    cinza: bool
+        Converte faixas RGB para escala de cinza.
+
+    Retorno
+    -------
+    faixa: np.ndarray
+        Matriz 3D `(linhas, largura, canais)` com `uint8`.
+
+    Erro
+    ----
+    ValueError
+        Quando o arquivo termina antes do esperado.
+    """
+    # lida direto na faixa, que os kernels podem receber sem cópia
+    faixa = np.empty((linhas, largura, canais), dtype=np.uint8)
+    if arquivo.readinto(faixa.data) != faixa.nbytes:
+        nome = getattr(arquivo, 'name', '')
+        msg = f'"{nome}" terminou antes do esperado'
+        raise ValueError(msg)
+
+    if cinza and canais == 3:
+        faixa = pnm_cinza(faixa)[..., np.newaxis]
+    return faixa
+
+
+def meios_tons_fluxo(entrada: str, saidas: List[str], dist: ErrorDist, varredura: Varredura,
+                     cinza: bool=False, linhas: int=LINHAS, paleta: Paleta=BINARIA) -> None:
+    """
+    Aplicação da técnica de meios-tons lendo e escrevendo arquivos PGM/PPM
+    em faixas. A memória usada depende apenas da largura da imagem e da
+    altura das faixas, e o resultado é idêntico ao de ``meios_tons``.
+
+    Parâmetros
+    ----------
+    entrada: str
+        Arquivo PGM ou PPM binário de entrada.
+    saidas: list
+        Arquivos `.pgm`, `.ppm` ou `.pnm` onde o resultado será gravado, já
+        com os valores da paleta. O PGM é apenas para a saída em escala de
+        cinza e o PPM apenas para a colorida.
+    dist: np.ndarray
+        Matriz com as distribuições de erro à serem aplicadas.
+    varredura: Varredura
+        Ordem de aplicação, apenas as horizontais são suportadas.
+    cinza: bool, opcional
+        Aplica em escala de cinza.
+    linhas: int, opcional
+        Altura das faixas.
+    paleta: Paleta, opcional
+        Quantização da saída (ver ``lib.paletas``). Com uma paleta de cores,
+        a saída é sempre PPM.
+
+    Erro
+    ----
+    ValueError
+        Quando a varredura não segue as linhas, com um mapa de limiares,
+        com uma paleta de cores em escala de cinza, quando os arquivos não
+        estão no formato esperado ou quando a extensão de uma saída não é
+        de PGM/PPM, ou não corresponde aos canais do resultado.
+    """
+    if varredura > Varredura.alternada:
+        msg = f'varredura {varredura} não pode ser aplicada em fluxo'
+        raise ValueError(msg)
+    elif ordenado(dist):
+        msg = 'o pontilhado ordenado não pode ser aplicado em fluxo'
+        raise ValueError(msg)
+    for saida in saidas:
+        if os.path.splitext(saida)[1].lower() not in EXT_PNM:
+            msg = f'o modo em fluxo grava apenas PGM/PPM: {saida}'
+            raise ValueError(msg)
+    alternada = varredura == Varredura.alternada
+    linhas = max(linhas, 1)
+
+    # pesos não nulos e bordas, como em ``varredura_horizontal``
+    tH, tW = dist.shape
+    dy, dx, w = pesos_esparsos(dist, 0, (tW - 1) // 2)
+    _, L, esq, dir = margens(dy, dx)
+    if alternada:
+        esq = dir = max(esq, dir)
+
+    with ExitStack() as pilha:
+        arquivo = pilha.enter_context(open(entrada, mode='rb'))
+        H, W, C = pnm_le_cabecalho(arquivo)
+        canais = 1 if cinza else C
+        if paleta.conjunta and canais < 3:
+            msg = 'paleta de cores apenas em imagens coloridas'
+            raise ValueError(msg)
+        # a paleta de cores tem um único índice por pixel, e o PPM é RGB
+        indices = 1 if paleta.conjunta else canais
+        paleta = em_rgb(paleta)
+
+        # PGM em escala de cinza e PPM colorido, antes de criar as saídas
+        canais_saida = 3 if paleta.conjunta else canais
+        for saida in saidas:
+            ext = os.path.splitext(saida)[1].lower()
+            if CANAIS_PNM.get(ext, canais_saida) != canais_saida:
+                tipo = 'colorida' if canais_saida == 3 else 'em escala de cinza'
+                msg = f'saída {tipo} não pode ser gravada como {ext}: {saida}'
+                raise ValueError(msg)
+
+        outs = [pilha.enter_context(open(saida, mode='wb')) for saida in saidas]
+        for out in outs:
+            out.write(pnm_cabecalho(H, W, canais_saida))
+
+        # as primeiras `L` linhas já ficam no anel, com os canais intercalados
+        faixa = le_faixa(arquivo, min(L, H), W, C, cinza)
+        Cd = min(faixa.shape[2], 3)
+        anel = anel_inicial(faixa, L, esq, dir, 0, Cd)
+
+        y0 = 0
+        while y0 < H:
+            n = min(linhas, H - y0)
+            # o anel lê `L` linhas à frente das processadas
+            faixa = le_faixa(arquivo, max(0, min(n, H - y0 - L)), W, C, cinza)
+
+            res = np.empty((n, W, indices), dtype=np.uint8)
+            difunde_linhas(faixa, res, anel, dy, dx, w, esq, y0, H, alternada, False,
+                           paleta.cores, paleta.lut, 0, Cd)
+            # valores da paleta na saída
+            img = paleta.expande(res.reshape(n, W) if paleta.conjunta else res)
+
+            for out in outs:
+                out.write(img.tobytes())
+            y0 += n
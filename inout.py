@@ -1,15 +1,25 @@
 """
 Funções de IO com as imagens.
 """
+from typing import BinaryIO, Tuple
 from tipos import Image
+import os, struct, zlib
 import cv2
 import numpy as np
 
 
+# formatos sem compressão, mapeados direto na memória
+EXT_PNM = ('.pgm', '.ppm', '.pnm')
+EXT_NPY = ('.npy',)
+
+
 def imgread(arquivo: str, modo: int=cv2.IMREAD_COLOR) -> Image:
     """
     Lê um arquivo de imagem em escala de cinza.
 
+    Arquivos PGM/PPM binários e `.npy` são mapeados na memória, sem cópia
+    nem decodificação, quando não precisam de conversão de cor.
+
     Parâmetros
     ----------
     arquivo: str
@@ -22,6 +32,17 @@ def imgread(arquivo: str, modo: int=cv2.IMREAD_COLOR) -> Image:
     img: np.ndarray
         Matriz representando a imagem lida.
     """
+    ext = os.path.splitext(arquivo)[1].lower()
+    if modo in (cv2.IMREAD_COLOR, cv2.IMREAD_GRAYSCALE):
+        if ext in EXT_NPY:
+            return npy_read(arquivo, modo)
+        elif ext in EXT_PNM:
+            try:
+                return pnm_read(arquivo, modo)
+            # PNM em ASCII ou com outros valores máximos ficam com o OpenCV
+            except ValueError:
+                pass
+
     # abre o arquivo fora do OpenCV, para que o
     # Python trate os erros de IO
     with open(arquivo, mode='rb') as filebuf:
@@ -33,12 +54,65 @@ def imgread(arquivo: str, modo: int=cv2.IMREAD_COLOR) -> Image:
         msg = f'não foi possível parsear "{arquivo}" como imagem'
         raise ValueError(msg)
 
+    return oito_bits(img, f'"{arquivo}"')
+
+
+def imgdecode(dados: bytes, modo: int=cv2.IMREAD_COLOR) -> Image:
+    """
+    Decodifica uma imagem já em memória, como no corpo de uma requisição.
+
+    Erro
+    ----
+    ValueError
+        Quando os dados não representam uma imagem.
+    """
+    img = cv2.imdecode(np.frombuffer(dados, dtype=np.uint8), modo)
+    if img is None:
+        msg = 'não foi possível parsear os dados como imagem'
+        raise ValueError(msg)
+    return oito_bits(img, 'a imagem')
+
+
+def oito_bits(img: Image, nome: str) -> Image:
+    """
+    Checa que a imagem tem 8 bits por canal, como esperado pelos kernels. Só
+    a leitura sem conversão (`IMREAD_UNCHANGED`) mantém outras profundidades.
+
+    Erro
+    ----
+    ValueError
+        Quando a imagem tem outro tipo, como PNG de 16 bits.
+    """
+    if img.dtype != np.uint8:
+        msg = f'{nome} tem {img.dtype.itemsize * 8} bits por canal ({img.dtype}), apenas 8 bits são suportados'
+        raise ValueError(msg)
     return img
 
 
+def imgencode(img: Image, ext: str='.png') -> bytes:
+    """
+    Codifica uma imagem no formato da extensão (ex.: `.png`), em memória.
+
+    Erro
+    ----
+    ValueError
+        Quando a imagem não pode ser codificada nesse formato.
+    """
+    try:
+        ok, buf = cv2.imencode(ext, img)
+    except cv2.error:
+        ok = False
+    if not ok:
+        msg = f'não foi possível codificar a imagem como "{ext}"'
+        raise ValueError(msg)
+    return buf.tobytes()
+
+
 def imgwrite(img: Image, arquivo: str) -> None:
     """
-    Escreve uma matriz como imagem PNG em um arquivo.
+    Escreve uma matriz como imagem PNG em um arquivo. Com extensão
+    `.pgm`, `.ppm` ou `.npy`, os pixels são copiados para o arquivo mapeado
+    na memória, sem codificação.
 
     Parâmetros
     ----------
@@ -54,12 +128,149 @@ def imgwrite(img: Image, arquivo: str) -> None:
         a entrada não representa uma imagem ou não pode ser
         convertido para a extensão eserada.
     """
+    # formatos mapeados na memória, sem codificação
+    ext = os.path.splitext(arquivo)[1].lower()
+    if ext in EXT_NPY + EXT_PNM and img.ndim in (2, 3):
+        out = imgcria(arquivo, img.shape)
+        if out.ndim == 3 and ext in EXT_PNM:
+            # PPM em RGB
+            out[...] = img[..., ::-1]
+        else:
+            out[...] = img
+        out.flush()
+        return
+
     # indica para o caller quando a imagem NÃO for salva
     if not cv2.imwrite(arquivo, img):
         msg = f'não foi possível salvar a imagem em "{arquivo}"'
         raise ValueError(msg)
 
 
+def imgwrite_bits(bits: Image, largura: int, arquivo: str) -> None:
+    """
+    Escreve um resultado empacotado, com 1 bit por pixel (ver ``lib.bits``).
+    Arquivos `.png` e `.pbm` são gravados com 1 bit por pixel, direto do
+    buffer, e as outras extensões passam por ``imgwrite`` com 0 e 255.
+
+    Parâmetros
+    ----------
+    bits: np.ndarray
+        Matriz 2D com `uint8`, 8 pixels por byte em cada linha, com o
+        primeiro no bit mais significativo e 1 para branco.
+    largura: int
+        Largura da imagem, em pixels.
+    arquivo: str
+        Caminho para o arquivo onde a imagem será gravada.
+
+    Erro
+    ----
+    ValueError
+        Quando a largura não corresponde ao buffer ou quando a imagem não
+        pode ser salva no arquivo.
+    """
+    if bits.ndim != 2 or bits.shape[1] != (largura + 7) // 8:
+        msg = f'não foi possível salvar a imagem em "{arquivo}"'
+        raise ValueError(msg)
+
+    ext = os.path.splitext(arquivo)[1].lower()
+    if ext == '.png':
+        dados = png_bits(bits, largura)
+    elif ext == '.pbm':
+        # no PBM, 1 é preto
+        dados = pbm_cabecalho(bits.shape[0], largura) + np.invert(bits).tobytes()
+    else:
+        img = np.unpackbits(bits, axis=-1, count=largura)
+        img *= 255
+        return imgwrite(img, arquivo)
+
+    with open(arquivo, mode='wb') as out:
+        out.write(dados)
+
+
+def imgcria(arquivo: str, forma: Tuple[int, ...]) -> np.memmap:
+    """
+    Cria um arquivo PGM/PPM ou `.npy` já no tamanho final e o mapeia na
+    memória, para que o resultado seja escrito diretamente no arquivo.
+
+    Parâmetros
+    ----------
+    arquivo: str
+        Caminho do arquivo, com extensão `.pgm`, `.ppm`, `.pnm` ou `.npy`.
+    forma: tuple
+        Dimensões `(H, W)` ou `(H, W, 3)` da imagem.
+
+    Retorno
+    -------
+    out: np.memmap
+        Matriz com `uint8` mapeada no arquivo. Imagens coloridas ficam em
+        ordem RGB em arquivos PPM e BGR em `.npy`.
+
+    Erro
+    ----
+    ValueError
+        Quando a extensão ou as dimensões não são suportadas.
+    """
+    ext = os.path.splitext(arquivo)[1].lower()
+    if len(forma) not in (2, 3) or (len(forma) == 3 and forma[2] != 3):
+        msg = f'não foi possível salvar a imagem em "{arquivo}"'
+        raise ValueError(msg)
+
+    if ext in EXT_NPY:
+        return np.lib.format.open_memmap(arquivo, mode='w+', dtype=np.uint8, shape=tuple(forma))
+    elif ext not in EXT_PNM:
+        msg = f'extensão não mapeável na memória: "{arquivo}"'
+        raise ValueError(msg)
+
+    H, W = forma[:2]
+    canais = 1 if len(forma) == 2 else 3
+    cabecalho = pnm_cabecalho(H, W, canais)
+    # arquivo com o tamanho final
+    with open(arquivo, mode='wb') as out:
+        out.write(cabecalho)
+        out.truncate(len(cabecalho) + H * W * canais)
+    return np.memmap(arquivo, dtype=np.uint8, mode='r+', offset=len(cabecalho), shape=tuple(forma))
+
+
+def npy_read(arquivo: str, modo: int) -> Image:
+    """
+    Leitura de uma imagem `.npy`, mapeada na memória (em cópia na escrita,
+    para que os kernels possam usar diretamente).
+    """
+    img = np.load(arquivo, mmap_mode='c', allow_pickle=False)
+    if img.dtype != np.uint8 or img.ndim not in (2, 3) or (img.ndim == 3 and img.shape[2] != 3):
+        msg = f'não foi possível parsear "{arquivo}" como imagem'
+        raise ValueError(msg)
+
+    if modo == cv2.IMREAD_GRAYSCALE and img.ndim == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    elif modo == cv2.IMREAD_COLOR and img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    elif not img.flags.c_contiguous:
+        return np.ascontiguousarray(img)
+    return img
+
+
+def pnm_read(arquivo: str, modo: int) -> Image:
+    """
+    Leitura de uma imagem PGM/PPM binária, mapeada na memória. Imagens PPM
+    coloridas precisam de uma cópia para a ordem BGR do OpenCV.
+    """
+    with open(arquivo, mode='rb') as buf:
+        H, W, C = pnm_le_cabecalho(buf)
+        inicio = buf.tell()
+
+    forma = (H, W) if C == 1 else (H, W, C)
+    img = np.memmap(arquivo, dtype=np.uint8, mode='c', offset=inicio, shape=forma)
+
+    if C == 1 and modo == cv2.IMREAD_COLOR:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    elif C == 3 and modo == cv2.IMREAD_GRAYSCALE:
+        return pnm_cinza(img)
+    elif C == 3:
+        return np.ascontiguousarray(img[..., ::-1])
+    return img
+
+
 def imgshow(img: Image, nome: str="", delay: int=250) -> None:
     """
     Apresenta a imagem em uma janela com um nome.
@@ -89,3 +300,129 @@ def imgshow(img: Image, nome: str="", delay: int=250) -> None:
     # Ctrl-C não são erros nesse caso
     except KeyboardInterrupt:
         pass
+
+
+# # # # # # # # # # # # # # # # #
+# Formato PNM (PGM/PPM binários) #
+
+def pnm_le_cabecalho(arquivo: BinaryIO) -> Tuple[int, int, int]:
+    """
+    Lê o cabeçalho de um arquivo PGM (P5) ou PPM (P6) com 8 bits por canal,
+    deixando o arquivo posicionado no início dos pixels.
+
+    Parâmetros
+    ----------
+    arquivo: arquivo binário
+        Arquivo aberto para leitura.
+
+    Retorno
+    -------
+    altura, largura, canais: int
+        Dimensões da imagem, com 1 canal no PGM e 3 (RGB) no PPM.
+
+    Erro
+    ----
+    ValueError
+        Quando o arquivo não é um PGM ou PPM binário com valor máximo 255.
+    """
+    def campo() -> bytes:
+        c = arquivo.read(1)
+        # espaços e comentários até o fim da linha
+        while c.isspace() or c == b'#':
+            if c == b'#':
+                arquivo.readline()
+            c = arquivo.read(1)
+
+        valor = b''
+        # o espaço que termina o campo é consumido, então
+        # o último campo deixa o arquivo no início dos pixels
+        while c and not c.isspace():
+            valor += c
+            c = arquivo.read(1)
+        return valor
+
+    nome = getattr(arquivo, 'name', '')
+    campos = [campo() for _ in range(4)]
+
+    if campos[0] not in (b'P5', b'P6') or not all(c.isdigit() for c in campos[1:]):
+        msg = f'"{nome}" não é um arquivo PGM ou PPM binário'
+        raise ValueError(msg)
+
+    largura, altura, maximo = map(int, campos[1:])
+    if maximo != 255:
+        msg = f'"{nome}" não usa 8 bits completos por canal'
+        raise ValueError(msg)
+
+    canais = 1 if campos[0] == b'P5' else 3
+    return altura, largura, canais
+
+
+def pnm_cabecalho(altura: int, largura: int, canais: int) -> bytes:
+    """
+    Cabeçalho de um arquivo PGM (1 canal) ou PPM (3 canais) de 8 bits.
+    """
+    tipo = 'P5' if canais == 1 else 'P6'
+    return f'{tipo}\n{largura} {altura}\n255\n'.encode('ascii')
+
+
+def pnm_cinza(img: Image) -> Image:
+    """
+    Conversão de pixels RGB de um PPM para escala de cinza, com os mesmos
+    coeficientes em ponto fixo do decodificador PxM do OpenCV, para que o
+    resultado seja igual ao de ``imgread`` com ``cv2.IMREAD_GRAYSCALE``.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz `(..., 3)` com `uint8`, em ordem RGB.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Matriz com `uint8`, sem o eixo dos canais.
+    """
+    rgb = img.astype(np.uint32)
+    cinza = rgb[..., 0] * 4899 + rgb[..., 1] * 9617 + rgb[..., 2] * 1868
+    return ((cinza + (1 << 13)) >> 14).astype(np.uint8)
+
+
+# # # # # # # # # # # # # # # # #
+# Formatos com 1 bit por pixel  #
+
+def pbm_cabecalho(altura: int, largura: int) -> bytes:
+    """
+    Cabeçalho de um arquivo PBM binário (P4).
+    """
+    return f'P4\n{largura} {altura}\n'.encode('ascii')
+
+
+def png_bits(bits: Image, largura: int) -> bytes:
+    """
+    Codificação de um PNG em escala de cinza com 1 bit por pixel, que usa o
+    mesmo layout do resultado empacotado. Cada linha recebe apenas o byte
+    do filtro (nenhum) antes da compressão.
+
+    Parâmetros
+    ----------
+    bits: np.ndarray
+        Matriz 2D com `uint8`, 8 pixels por byte em cada linha.
+    largura: int
+        Largura da imagem, em pixels.
+
+    Retorno
+    -------
+    png: bytes
+        Conteúdo do arquivo PNG.
+    """
+    def chunk(tipo: bytes, dados: bytes) -> bytes:
+        crc = zlib.crc32(tipo + dados) & 0xFFFFFFFF
+        return struct.pack('>I', len(dados)) + tipo + dados + struct.pack('>I', crc)
+
+    altura = bits.shape[0]
+    linhas = np.zeros((altura, bits.shape[1] + 1), dtype=np.uint8)
+    linhas[:, 1:] = bits
+
+    # profundidade 1, escala de cinza, sem entrelaçamento
+    ihdr = struct.pack('>IIBBBBB', largura, altura, 1, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr)
+            + chunk(b'IDAT', zlib.compress(linhas.tobytes(), 6)) + chunk(b'IEND', b''))
@@ -2,14 +2,24 @@
 Operação de pontilhado e modos de varredura.
 """
 from enum import IntEnum, unique
+from typing import List, Optional, Sequence, Union
 from tipos import Image, ErrorDist
 import numpy as np
 
-from .nb import jit, prange, USANDO_NUMBA
-from .horizontal import varredura_unidirecional, varredura_alternada
+from .nb import USANDO_NUMBA, threads
+from .horizontal import varredura_unidirecional, varredura_alternada, varredura_horizontal, \
+    varredura_horizontal_paralela
 from .direcao import err_dist_direcoes
-from .hilbert import varredura_hilbert, hilbert_indices
-from .espiral import varredura_espiral
+from .caminho import varredura_caminho, varredura_caminho_paralela
+from .frente import varredura_frente
+from .faixas import varredura_faixas
+from .bits import empacota, desempacota
+from .ordens import ORDENS, INICIO
+from .limiares import Mapa, ordenado, pontilhado_ordenado
+from .pilha import pilha_horizontal, pilha_caminho, pilha_ordenado
+from .paletas import Paleta, BINARIA
+from .perfil import Perfil
+from .cache import Cache
 
 
 # # # # # # # # # # # #
@@ -32,24 +42,101 @@ class Varredura(IntEnum):
         Aplica a distribuição seguindo uma curva de Hilbert.
     espiral
         Tentativa de aplicar os erros em varredura espiral.
+    morton
+        Segue a curva de Morton (ordem Z).
+    peano
+        Segue a curva de Peano.
+    coluna
+        Alternada, mas coluna a coluna, para imagens altas.
+
+    As variantes a partir de ``hilbert`` seguem um caminho de ``ORDENS``,
+    aplicado por ``varredura_caminho``.
     """
     unidirecional   = 0
     alternada       = 1
     hilbert         = 2
     espiral         = 3
+    morton          = 4
+    peano           = 5
+    coluna          = 6
 
-    def __call__(self, img: Image, dist: ErrorDist) -> Image:
+    def __call__(self, img: Image, dist: ErrorDist, bits: bool=False, paleta: Paleta=BINARIA,
+                 paralelo: bool=True) -> Image:
         """
         Chama a função de varredura com as transformações necessárias.
+        Imagens coloridas (BGR ou BGRA) são aplicadas com os canais
+        intercalados, cada canal de cor em uma thread com `paralelo`, ou
+        todos numa única passada. Com uma única thread, a passada única é
+        mais rápida, já que os canais independentes se sobrepõem na CPU.
+        Com `bits`, o resultado é empacotado com 1 bit por pixel, direto
+        nas varreduras horizontais. O resultado tem os índices da
+        `paleta`, em uma matriz 2D com paletas de cores.
+
+        Com `paralelo`, não deve ser chamada de várias threads ao mesmo
+        tempo, como no modo em lote.
+
+        Erro
+        ----
+        ValueError
+            Quando uma paleta de cores é usada sem os canais BGR.
         """
-        if self == Varredura.unidirecional:
-            return varredura_unidirecional(img, dist)
-        elif self == Varredura.alternada:
-            return varredura_alternada(img, dist)
-        elif self == Varredura.hilbert:
-            return varredura_hilbert(img, err_dist_direcoes(dist), None)
-        elif self == Varredura.espiral:
-            return varredura_espiral(img, err_dist_direcoes(dist))
+        H, W = img.shape[:2]
+        # os kernels sempre recebem os canais em um terceiro eixo
+        canais = img.reshape(H, W, -1)
+        if paleta.conjunta and canais.shape[2] < 3:
+            msg = 'paleta de cores apenas em imagens coloridas'
+            raise ValueError(msg)
+
+        # os canais só trocam erros com uma paleta de cores
+        por_canal = (paralelo and canais.shape[2] > 1 and not paleta.conjunta and not bits
+                     and threads() > 1)
+
+        if self == Varredura.unidirecional or self == Varredura.alternada:
+            alternada = self == Varredura.alternada
+            if por_canal:
+                res = varredura_horizontal_paralela(canais, dist, alternada, paleta.cores, paleta.lut)
+            else:
+                res = varredura_horizontal(canais, dist, alternada, bits, paleta.cores, paleta.lut)
+        else:
+            idx = ORDENS(self.name, H, W)
+            kernel = varredura_caminho_paralela if por_canal else varredura_caminho
+            res = kernel(canais, err_dist_direcoes(dist), idx, INICIO[self.name],
+                         paleta.cores, paleta.lut)
+            if bits:
+                return empacota(res.reshape(H, W))
+
+        return res.reshape(res.shape[:2]) if img.ndim == 2 or paleta.conjunta else res
+
+    def __str__(self) -> str:
+        """
+        Nome que aparece na linha de comando.
+        """
+        return self.name
+
+
+# # # # # # # # # # # # # # #
+# Motores de execução       #
+
+@unique
+class Motor(IntEnum):
+    """
+    Formas de execução da varredura.
+
+    Variantes
+    ---------
+    sequencial
+        Kernels de cada varredura, com os canais de cor em paralelo.
+    frente
+        Linhas em paralelo numa frente de onda, com resultado idêntico ao
+        sequencial. Apenas para a varredura unidirecional, já que na
+        alternada cada linha começa onde a anterior termina.
+    faixas
+        Faixas horizontais independentes em paralelo, com sobreposição para
+        reduzir as emendas. Aproximado, para as varreduras horizontais.
+    """
+    sequencial  = 0
+    frente      = 1
+    faixas      = 2
 
     def __str__(self) -> str:
         """
@@ -58,10 +145,20 @@ class Varredura(IntEnum):
         return self.name
 
 
+# largura mínima dos blocos de colunas na frente de onda
+BLOCO_FRENTE = 64
+# altura e sobreposição padrão das faixas
+FAIXA = 256
+SOBREPOSICAO = 16
+
+
 # # # # # # # # # # # # # # #
 # Aplicação dos meios-tons  #
 
-def meios_tons(img: Image, dist: ErrorDist, varredura=Varredura) -> Image:
+def meios_tons(img: Image, dist: Union[ErrorDist, Mapa], varredura=Varredura, motor: Motor=Motor.sequencial,
+               faixa: int=FAIXA, sobreposicao: int=SOBREPOSICAO, bits: bool=False,
+               paleta: Paleta=BINARIA, perfil: Optional[Perfil]=None,
+               cache: Optional[Cache]=None) -> Image:
     """
     Aplicação da técnica de meios-tons seguindo uma distribuição e um padrão
     de varredura.
@@ -69,74 +166,194 @@ def meios_tons(img: Image, dist: ErrorDist, varredura=Varredura) -> Image:
     Parâmetros
     ----------
     img: np.ndarray
-        Matriz de 2 (em escalas de cinza) ou 3 (com canais RGB) dimensões que
-        representa a imagem.
-    dist: np.ndarray
+        Matriz de 2 (em escalas de cinza) ou 3 (com canais BGR ou BGRA)
+        dimensões que representa a imagem. O canal alfa é mantido.
+    dist: np.ndarray ou Mapa
         Matriz com as distribuições de erro à serem aplicadas. Assume largura
         ímpar, iniciando a aplicação na posição intermediária da primeira linha.
+        Um ``Mapa`` de limiares (ver ``lib.limiares``) aplica o pontilhado
+        ordenado, em paralelo e sem varredura.
     varredura: Varredura, opcional
         Ordem de aplicação na imagem.
+    motor: Motor, opcional
+        Forma de execução da varredura. Ignorado no pontilhado ordenado.
+    faixa, sobreposicao: int, opcional
+        Altura das faixas e linhas sobrepostas no motor ``Motor.faixas``.
+    bits: bool, opcional
+        Resultado empacotado, com 8 pixels por byte em cada linha (ver
+        ``lib.bits``). Apenas em escala de cinza, com dois níveis.
+    paleta: Paleta, opcional
+        Níveis de cada canal ou paleta de cores da saída (ver
+        ``lib.paletas``). O padrão é binário, com o limiar em 128.
+    perfil: Perfil, opcional
+        Registra o tempo e a memória da aplicação na etapa `pontilhado`
+        (ver ``lib.perfil``).
+    cache: Cache, opcional
+        Consulta e guarda o resultado no cache local (ver ``lib.cache``).
+        Um resultado do cache pode ser apenas para leitura.
 
     Retorno
     -------
     out: np.ndarray
-        Imagem resultante do pontilhado.
+        Imagem resultante do pontilhado, com os índices da paleta (0 e 1
+        no caso binário). Veja ``Paleta.expande``.
+
+    Erro
+    ----
+    ValueError
+        Quando o motor não suporta aquela varredura ou aquela paleta, ou
+        quando o resultado empacotado é pedido para uma imagem colorida.
     """
-    if img.ndim == 3:
-        # aplicação em imagens RGB
-        return meios_tons_colorida(img, dist, varredura.value)
-    else:
-        # imagens em escala de cinza
-        return varredura(img, dist)
+    if perfil is not None:
+        with perfil.etapa('pontilhado'):
+            return meios_tons(img, dist, varredura, motor, faixa, sobreposicao, bits, paleta,
+                              cache=cache)
+
+    if cache is not None:
+        # o pontilhado ordenado não depende do motor
+        if ordenado(dist) or motor == Motor.sequencial:
+            opcoes = ()
+        elif motor == Motor.faixas:
+            opcoes = int(motor), faixa, sobreposicao
+        else:
+            opcoes = int(motor),
+        calcula = lambda: meios_tons(img, dist, varredura, motor, faixa, sobreposicao, bits, paleta)
+        return cache.aplica(calcula, img, dist, paleta, varredura, bits, opcoes)
+
+    if ordenado(dist) and paleta is not BINARIA:
+        msg = 'pontilhado ordenado apenas com dois níveis'
+        raise ValueError(msg)
+    elif motor != Motor.sequencial and paleta.conjunta:
+        msg = f'motor {motor} não suporta paletas de cores'
+        raise ValueError(msg)
+
+    if bits:
+        if img.ndim != 2:
+            msg = 'resultado em bits apenas em escala de cinza'
+            raise ValueError(msg)
+        elif paleta is not BINARIA:
+            msg = 'resultado em bits apenas com dois níveis'
+            raise ValueError(msg)
+        elif ordenado(dist):
+            return empacota(pontilhado_ordenado(img, dist))
+        elif motor == Motor.sequencial:
+            return varredura(img, dist, bits=True)
+        # os motores paralelos empacotam depois
+        return empacota(meios_tons(img, dist, varredura, motor, faixa, sobreposicao))
+
+    if ordenado(dist):
+        # sem dependência entre os pixels
+        return pontilhado_ordenado(img, dist)
+
+    elif motor == Motor.frente:
+        if varredura != Varredura.unidirecional:
+            msg = f'motor {motor} disponível apenas na varredura unidirecional'
+            raise ValueError(msg)
+        return por_canal(varredura_frente, img, dist, BLOCO_FRENTE, paleta.cores, paleta.lut)
+
+    elif motor == Motor.faixas:
+        if varredura > Varredura.alternada:
+            msg = f'motor {motor} disponível apenas nas varreduras horizontais'
+            raise ValueError(msg)
+        alternada = varredura == Varredura.alternada
+        return por_canal(varredura_faixas, img, dist, alternada, faixa, sobreposicao,
+                         paleta.cores, paleta.lut)
+
+    return varredura(img, dist, paleta=paleta)
+
+
+def por_canal(kernel, img: Image, *args) -> Image:
+    """
+    Aplica um kernel paralelo de canal único em cada canal da imagem,
+    em sequência, já que o paralelismo fica dentro do kernel. O canal
+    alfa é copiado.
+    """
+    if img.ndim == 2:
+        return kernel(img, *args)
 
+    res = np.copy(img)
+    for ch in range(min(img.shape[2], 3)):
+        res[..., ch] = kernel(np.copy(img[..., ch]), *args)
+    return res
+
+
+# # # # # # # # # # # # # # #
+# Pilhas de imagens         #
 
-@jit("uint8[:,:,::1](uint8[:,:,::1], float32[:,::1], uint8)", parallel=True)
-def meios_tons_colorida(img: Image, dist: ErrorDist, varredura: int) -> Image:
+def meios_tons_pilha(imgs: Union[np.ndarray, Sequence[Image]], dist: Union[ErrorDist, Mapa],
+                     varredura: Varredura=Varredura.alternada,
+                     paleta: Paleta=BINARIA) -> Union[np.ndarray, List[Image]]:
     """
-    Especialização para imagens RGB com o Numba. Cada canal de cor é resolvido
-    em paralelo.
+    Aplicação de ``meios_tons`` em várias imagens, com uma única chamada
+    compilada para cada tamanho e as imagens em paralelo dentro dela (ver
+    ``lib.pilha``). O resultado é idêntico ao de cada imagem separada, no
+    motor sequencial.
+
+    Como os kernels já são paralelos, não deve ser chamada de várias threads
+    ao mesmo tempo.
 
     Parâmetros
     ----------
-    img: np.ndarray
-        Matriz 3D com `uint8` em ordem row-major.
-    dist: np.ndarray
-        Matriz 2D com `float32` em ordem row-major.
-    varredura: int
-        Ordem de aplicação na imagem, de acordo com a classe ``Varredura``.
+    imgs: np.ndarray ou lista
+        Pilha `(N, H, W)` em escala de cinza ou `(N, H, W, C)` com os canais
+        BGR ou BGRA, ou uma lista de imagens. Imagens de tamanhos diferentes
+        na lista são agrupadas por tamanho.
+    dist: np.ndarray ou Mapa
+        Distribuição de erros ou mapa de limiares, como em ``meios_tons``.
+    varredura: Varredura, opcional
+        Ordem de aplicação em cada imagem.
+    paleta: Paleta, opcional
+        Níveis de cada canal ou paleta de cores da saída.
 
     Retorno
     -------
-    out: np.ndarray
-        Matriz 3D com `uint8` em ordem row-major.
+    out: np.ndarray ou lista
+        Índices resultantes, no mesmo formato da entrada: uma pilha, sem o
+        eixo dos canais com paletas de cores, ou uma lista.
+
+    Erro
+    ----
+    ValueError
+        Quando a pilha não tem 3 ou 4 dimensões, ou nos mesmos casos de
+        ``meios_tons``.
     """
+    if not isinstance(imgs, np.ndarray):
+        # uma chamada por tamanho, na ordem original
+        grupos = {}
+        for i, img in enumerate(imgs):
+            grupos.setdefault(img.shape, []).append(i)
+        res: List[Optional[Image]] = [None] * len(imgs)
+        for indices in grupos.values():
+            pilha = np.stack([imgs[i] for i in indices])
+            for i, out in zip(indices, meios_tons_pilha(pilha, dist, varredura, paleta)):
+                res[i] = out
+        return res
 
-    H, W, _ = img.shape
-    # imagem resultante
-    res = np.empty((H, W, 3), dtype=np.uint8)
-
-    # índices da curva de Hilbert
-    if varredura == Varredura.hilbert:
-        idx = hilbert_indices(H, W)
-    # distribuição rotacionada em 0, 90, 180 e 270 graus
-    if varredura >= Varredura.hilbert:
-        dists = err_dist_direcoes(dist)
-
-    # aplica os canais em paralelo
-    for ch in prange(3):
-        # copia para manter o row-major
-        subimg = np.copy(img[..., ch])
-
-        # aplicação da varredura em canal único
-        if varredura == Varredura.unidirecional:
-            ans = varredura_unidirecional(subimg, dist)
-        elif varredura == Varredura.alternada:
-            ans = varredura_alternada(subimg, dist)
-        elif varredura == Varredura.hilbert:
-            ans = varredura_hilbert(subimg, dists, idx)
-        else:
-            ans = varredura_espiral(subimg, dists)
-        # escreve o resultado no canal correto
-        res[..., ch] = ans
+    if imgs.ndim not in (3, 4):
+        msg = f'pilha deve ter 3 ou 4 dimensões: {imgs.shape}'
+        raise ValueError(msg)
+    N, H, W = imgs.shape[:3]
+    if N == 0:
+        # pilha vazia, sem os canais para o kernel
+        forma = imgs.shape[:3] if imgs.ndim == 3 or paleta.conjunta else imgs.shape
+        return np.empty(forma, dtype=np.uint8)
+    # os kernels sempre recebem os canais em um quarto eixo
+    canais = np.ascontiguousarray(imgs).reshape(N, H, W, -1)
+    if paleta.conjunta and canais.shape[3] < 3:
+        msg = 'paleta de cores apenas em imagens coloridas'
+        raise ValueError(msg)
 
-    return res
+    if ordenado(dist):
+        if paleta is not BINARIA:
+            msg = 'pontilhado ordenado apenas com dois níveis'
+            raise ValueError(msg)
+        res = pilha_ordenado(canais, dist.limiares)
+    elif varredura == Varredura.unidirecional or varredura == Varredura.alternada:
+        alternada = varredura == Varredura.alternada
+        res = pilha_horizontal(canais, dist, alternada, paleta.cores, paleta.lut)
+    else:
+        idx = ORDENS(varredura.name, H, W)
+        res = pilha_caminho(canais, err_dist_direcoes(dist), idx, INICIO[varredura.name],
+                            paleta.cores, paleta.lut)
+
+    return res.reshape(res.shape[:3]) if imgs.ndim == 3 or paleta.conjunta else res
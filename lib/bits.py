@@ -0,0 +1,68 @@
+"""
+Resultado empacotado, com 1 bit por pixel.
+
+Cada linha ocupa `ceil(W / 8)` bytes, com o primeiro pixel no bit mais
+significativo e os bits de preenchimento zerados no fim da linha, o mesmo
+layout de ``np.packbits(..., axis=1)`` e do PNG de 1 bit (1 é branco).
+"""
+from tipos import Image
+import numpy as np
+from .nb import jit
+
+
+@jit("uint8[:,::1](int64, int64, boolean)")
+def resultado(altura: int, largura: int, bits: bool) -> Image:
+    """
+    Aloca a imagem resultante de uma varredura.
+
+    Parâmetros
+    ----------
+    altura, largura: int
+        Dimensões da imagem, em pixels.
+    bits: bool
+        Resultado empacotado, com 1 bit por pixel.
+
+    Retorno
+    -------
+    res: np.ndarray
+        Matriz 2D com `uint8`, com `largura` ou `ceil(largura / 8)` colunas.
+    """
+    if bits:
+        return np.empty((altura, (largura + 7) // 8), dtype=np.uint8)
+    else:
+        return np.empty((altura, largura), dtype=np.uint8)
+
+
+@jit("void(uint8[::1], uint8[:])")
+def empacota_linha(linha: np.ndarray, out: np.ndarray) -> None:
+    """
+    Empacota uma linha com 0 e 1 em `out`, com `ceil(W / 8)` bytes.
+    """
+    W = linha.size
+    for b in range(out.size):
+        byte = 0
+        for i in range(8):
+            x = 8 * b + i
+            if x < W:
+                byte |= linha[x] << (7 - i)
+        out[b] = byte
+
+
+@jit("uint8[:,::1](uint8[:,::1])")
+def empacota(img: Image) -> Image:
+    """
+    Empacota um resultado com 0 e 1, um pixel por byte, para as varreduras
+    que não seguem as linhas.
+    """
+    H, W = img.shape
+    res = resultado(H, W, True)
+    for y in range(H):
+        empacota_linha(img[y], res[y])
+    return res
+
+
+def desempacota(res: Image, largura: int) -> Image:
+    """
+    Expande um resultado empacotado para um pixel por byte, com 0 e 1.
+    """
+    return np.unpackbits(res, axis=-1, count=largura)
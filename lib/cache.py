@@ -0,0 +1,186 @@
+"""
+Cache local dos resultados do pontilhado, endereçado pelo conteúdo.
+
+A chave é um hash dos pixels da entrada, da distribuição de erros (ou do
+mapa de limiares), da paleta, da varredura e das opções que alteram o
+resultado, junto da versão do motor: o código da ``lib`` e as versões do
+NumPy e do Numba. O modo de leitura, em cinza ou em cores, já muda os
+pixels e as dimensões da entrada. Cada resultado é um arquivo ``.npy``:
+com apenas 0 e 1, empacotado com 8 pixels por byte, e os demais lidos
+com ``mmap``. O tamanho total é limitado, removendo os resultados usados
+há mais tempo.
+"""
+from typing import Callable, Optional, Tuple, Union
+from functools import lru_cache
+import os, glob, hashlib, threading, uuid
+from tipos import Image, ErrorDist
+import numpy as np
+
+from .paletas import Paleta
+from .limiares import Mapa, ordenado
+
+
+# limite padrão do cache, em bytes
+LIMITE = 1 << 30
+
+
+@lru_cache(maxsize=None)
+def versao() -> bytes:
+    """
+    Versão do motor: hash do código da ``lib`` e das versões das
+    dependências que geram os kernels.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    for arquivo in sorted(glob.glob(os.path.join(pasta, '*.py'))):
+        with open(arquivo, 'rb') as fonte:
+            h.update(fonte.read())
+    try:
+        import numba
+        h.update(numba.__version__.encode())
+    except ImportError:
+        pass
+    h.update(np.__version__.encode())
+    return h.digest()
+
+
+def _atualiza(h, arr: np.ndarray) -> None:
+    """
+    Inclui o tipo, as dimensões e o conteúdo do array no hash.
+    """
+    h.update(f'{arr.dtype.str}{arr.shape};'.encode())
+    h.update(memoryview(np.ascontiguousarray(arr)).cast('B'))
+
+
+class Cache:
+    """
+    Resultados do pontilhado em uma pasta local, com um arquivo por chave.
+    Pode ser usado por várias threads e por vários processos.
+
+    Parâmetros
+    ----------
+    pasta: str
+        Diretório do cache, criado se não existir.
+    limite: int, opcional
+        Tamanho máximo dos arquivos, em bytes. Ao passar do limite, os
+        resultados acessados há mais tempo são removidos.
+    """
+    def __init__(self, pasta: str, limite: int=LIMITE):
+        self.pasta = pasta
+        self.limite = limite
+        self.acertos = self.faltas = 0
+        self._trava = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def chave(self, img: Image, dist: Union[ErrorDist, Mapa], paleta: Paleta, varredura: int,
+              bits: bool=False, motor: Tuple[int, ...]=()) -> str:
+        """
+        Chave de uma aplicação, em hexadecimal.
+
+        Parâmetros
+        ----------
+        img, dist, paleta
+            Os mesmos de ``meios_tons``.
+        varredura: int
+            Modo de varredura.
+        bits: bool, opcional
+            Resultado empacotado.
+        motor: tuple, opcional
+            Motor de execução e suas opções, vazio no motor sequencial.
+        """
+        h = hashlib.blake2b(versao(), digest_size=20)
+        if ordenado(dist):
+            # o pontilhado ordenado não depende da varredura
+            dist, varredura = dist.limiares, -1
+        for arr in (img, dist, paleta.cores, paleta.lut):
+            _atualiza(h, arr)
+        h.update(repr((int(varredura), bool(bits), tuple(motor))).encode())
+        return h.hexdigest()
+
+    def _arquivos(self, chave: str) -> Tuple[str, str]:
+        base = os.path.join(self.pasta, chave)
+        return base + '.npy', base + '.bits.npy'
+
+    def busca(self, chave: str, largura: int) -> Optional[Image]:
+        """
+        Resultado guardado na chave, ou `None`. O resultado é apenas para
+        leitura quando vem mapeado na memória.
+
+        Parâmetros
+        ----------
+        chave: str
+            Chave de ``Cache.chave``.
+        largura: int
+            Colunas do resultado, para desempacotar.
+        """
+        comum, bits = self._arquivos(chave)
+        try:
+            if os.path.exists(bits):
+                res = np.unpackbits(np.load(bits), axis=1, count=largura)
+                os.utime(bits)
+            else:
+                res = np.load(comum, mmap_mode='r')
+                os.utime(comum)
+        # removido por outra execução, ou inexistente
+        except (FileNotFoundError, ValueError):
+            self.faltas += 1
+            return None
+        self.acertos += 1
+        return res
+
+    def guarda(self, chave: str, res: Image) -> None:
+        """
+        Grava o resultado na chave e remove os mais antigos, se passar do
+        limite. A gravação é atômica, com um arquivo temporário.
+        """
+        comum, bits = self._arquivos(chave)
+        destino = comum
+        if res.dtype == np.uint8 and res.ndim >= 2 and res.size > 0 and res.max() <= 1:
+            res, destino = np.packbits(res, axis=1), bits
+
+        temporario = os.path.join(self.pasta, f'.{uuid.uuid4().hex}.tmp')
+        with open(temporario, 'wb') as arquivo:
+            np.save(arquivo, res)
+        os.replace(temporario, destino)
+        self.limpa()
+
+    def limpa(self) -> None:
+        """
+        Remove os resultados usados há mais tempo, até o tamanho total
+        ficar dentro do limite.
+        """
+        with self._trava:
+            arquivos = []
+            with os.scandir(self.pasta) as entradas:
+                for entrada in entradas:
+                    if not entrada.name.endswith('.npy'):
+                        continue
+                    try:
+                        info = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    arquivos.append((info.st_mtime, info.st_size, entrada.path))
+
+            total = sum(tamanho for _, tamanho, _ in arquivos)
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= self.limite:
+                    break
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+                total -= tamanho
+
+    def aplica(self, calcula: Callable[[], Image], img: Image, dist: Union[ErrorDist, Mapa], paleta: Paleta,
+               varredura: int, bits: bool=False, motor: Tuple[int, ...]=()) -> Image:
+        """
+        Resultado do cache, ou calculado com `calcula` e guardado. Os
+        demais parâmetros são os de ``Cache.chave``.
+        """
+        chave = self.chave(img, dist, paleta, varredura, bits, motor)
+        largura = (img.shape[1] + 7) // 8 if bits else img.shape[1]
+        res = self.busca(chave, largura)
+        if res is None:
+            res = calcula()
+            self.guarda(chave, res)
+        return res
@@ -0,0 +1,211 @@
+"""
+Varredura genérica seguindo um caminho pré-calculado, para as ordens que
+não seguem as linhas (Hilbert, espiral, Morton, Peano e colunas).
+
+Sem paleta de cores, cada canal segue o caminho de forma independente,
+então a versão paralela aplica cada canal em uma thread, com a própria
+imagem com bordas.
+"""
+from typing import Tuple
+from tipos import Image
+import numpy as np
+from .direcao import ErrorDistDir, Dir, direcao
+from .esparsa import pesos_direcoes, margens, com_halo
+from .nb import jit, prange, USANDO_NUMBA
+
+
+@jit("UniTuple(int64, 3)(int64, int64, boolean, int64, int64, int64, int64)")
+def avanca(i: int, dif: int, primeiro: bool, y: int, x: int, d: int, W: int) -> Tuple[int, int, int]:
+    """
+    Posição `(y, x)` e direção do passo até a posição linear `i`, a partir
+    da anterior. Passos para um vizinho atualizam a posição sem divisão.
+    """
+    if primeiro:
+        y, x = divmod(i, W)
+    elif dif == 1 and x + 1 < W:
+        x += 1
+        d = Dir.direita.value
+    elif dif == -1 and x > 0:
+        x -= 1
+        d = Dir.esquerda.value
+    elif dif == W:
+        y += 1
+        d = Dir.baixo.value
+    elif dif == -W:
+        y -= 1
+        d = Dir.cima.value
+    # saltos entre pontos distantes
+    else:
+        ny, nx = divmod(i, W)
+        d = direcao(nx, x, ny, y)
+        y, x = ny, nx
+    return y, x, d
+
+
+@jit("void(uint8[:,:,::1], uint8[:,:,::1], UniTuple(float32[:,::1], 4), uint32[::1], uint8, float64[:,::1], uint8[::1], int64, int64)")
+def difunde_caminho(img: Image, res: Image, dists: ErrorDistDir, idx: np.ndarray, inicio: int,
+                    cores: np.ndarray, lut: np.ndarray, c0: int, c1: int) -> None:
+    """
+    Varredura que visita os pixels na ordem de um caminho, nos canais `c0`
+    até `c1`.
+
+    A direção de cada passo vem do ponto anterior (veja ``direcao``), exceto
+    a do primeiro, que é dada. Os pesos de cada direção ficam como
+    deslocamentos lineares na imagem com bordas e a posição só é recalculada
+    nos saltos, então cada pixel custa basicamente os pesos não nulos. Os
+    canais de cor seguem o mesmo caminho, intercalados.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 3D `(H, W, C)` com `uint8` em ordem row-major, com os canais
+        intercalados.
+    res: np.ndarray
+        Índices resultantes, `(H, W, C)`, ou `(H, W, 1)` com uma paleta de
+        cores. Apenas os canais `c0` até `c1` são escritos.
+    dists: tuple
+        Quatro (4) matrizes 2D com `float32` em ordem row-major, com as
+        distribuições de erros para cada direção de aplicação.
+    idx: np.ndarray
+        Posição linear `y * W + x` de cada pixel, na ordem de visita. Cada
+        pixel deve aparecer pelo menos uma vez.
+    inicio: int
+        Direção do primeiro passo, de acordo com a enum ``Dir``.
+    cores, lut: np.ndarray
+        Quantização da saída, de ``lib.paletas.Paleta``. Com uma paleta de
+        cores, devem ser os três canais de cor.
+    c0, c1: int
+        Intervalo de canais aplicados, sem o alfa.
+    """
+    H, W, _ = img.shape
+    C = res.shape[2]
+    Cd = c1 - c0
+    # pesos não nulos em cada direção
+    dy, dx, w = pesos_direcoes(dists)
+    cima, baixo, esq, dir = margens(dy.ravel(), dx.ravel())
+
+    # imagem em ponto flutuante, com bordas, em acesso linear
+    buf = com_halo(img, cima, baixo, esq, dir, c0, c1)
+    Wb = W + esq + dir
+    plano = buf.ravel()
+    # deslocamento linear de cada peso, por direção
+    desl = np.empty(dy.shape, dtype=np.int64)
+    for d in range(4):
+        for k in range(dy.shape[1]):
+            desl[d, k] = (dy[d, k] * Wb + dx[d, k]) * Cd
+
+    # paleta de cores, com a LUT 3D de `B` bits por canal
+    Cq = cores.shape[1]
+    conjunta = Cq > 1
+    B = 0
+    while (1 << (3 * B + 3)) <= lut.size:
+        B += 1
+    valores = cores.ravel()
+    # com dois níveis, o limiar é a primeira intensidade do nível de cima
+    dois_niveis = not conjunta and cores.shape[0] == 2
+    limiar = float(np.argmax(lut)) if dois_niveis else 0.0
+    preto, branco = float(valores[0]), float(valores[-1])
+    saida = res.ravel()
+
+    # sem o Numba, os escalares do Python não têm overflow nos índices
+    if not USANDO_NUMBA:
+        idx, valores, lut = idx.tolist(), valores.tolist(), lut.tolist()
+
+    # posição e direção do passo atual; o laço é repetido para a paleta de
+    # cores, que não pesa no caso por canal
+    oi, y, x = 0, 0, 0
+    d = inicio
+    if conjunta:
+        for j in range(len(idx)):
+            i = idx[j]
+            y, x, d = avanca(i, i - oi, j == 0, y, x, d, W)
+            oi = i
+
+            p = ((y + cima) * Wb + x + esq) * Cd
+            # cor mais próxima, pelos bits mais altos de cada canal
+            ic = 0
+            for c in range(Cd):
+                ic = (ic << B) | (int(min(max(plano[p + c], 0.0), 255.0)) >> (8 - B))
+            q = lut[ic]
+            saida[i] = q
+
+            for c in range(Cd):
+                # carregamento do erro seguindo aquela direção
+                erro = plano[p + c] - valores[q * Cq + c]
+                for k in range(w.shape[1]):
+                    plano[p + c + desl[d, k]] += w[d, k] * erro
+    else:
+        for j in range(len(idx)):
+            i = idx[j]
+            y, x, d = avanca(i, i - oi, j == 0, y, x, d, W)
+            oi = i
+
+            p = ((y + cima) * Wb + x + esq) * Cd
+            for c in range(Cd):
+                intensidade = plano[p + c]
+                if dois_niveis:
+                    # apenas uma comparação com o limiar
+                    if intensidade < limiar:
+                        saida[i * C + c0 + c] = 0
+                        erro = intensidade - preto
+                    else:
+                        saida[i * C + c0 + c] = 1
+                        erro = intensidade - branco
+                else:
+                    # nível mais próximo, pela intensidade truncada
+                    q = lut[int(min(max(intensidade, 0.0), 255.0))]
+                    saida[i * C + c0 + c] = q
+                    erro = intensidade - valores[q]
+
+                # carregamento do erro seguindo aquela direção
+                for k in range(w.shape[1]):
+                    plano[p + c + desl[d, k]] += w[d, k] * erro
+
+
+@jit("uint8[:,:,::1](uint8[:,:,::1], UniTuple(float32[:,::1], 4), uint32[::1], uint8, float64[:,::1], uint8[::1])")
+def varredura_caminho(img: Image, dists: ErrorDistDir, idx: np.ndarray, inicio: int,
+                      cores: np.ndarray, lut: np.ndarray) -> Image:
+    """
+    Varredura que visita os pixels na ordem de um caminho, com todos os
+    canais na mesma passada (ver ``difunde_caminho``).
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 3D `(H, W, C)` com `uint8` em ordem row-major, com os canais
+        intercalados. Com 4 canais, o alfa é copiado sem pontilhado.
+    dists, idx, inicio, cores, lut
+        Os mesmos de ``difunde_caminho``.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Índices resultantes. Matriz 3D com `uint8` em ordem row-major, com um
+        único canal com uma paleta de cores.
+    """
+    H, W, C = img.shape
+    Cs = 1 if cores.shape[1] > 1 else C
+    res = np.empty((H, W, Cs), dtype=np.uint8)
+    difunde_caminho(img, res, dists, idx, inicio, cores, lut, 0, min(C, 3))
+    # canal alfa, sem pontilhado
+    if C > 3 and Cs == C:
+        res[..., 3:] = img[..., 3:]
+    return res
+
+
+@jit("uint8[:,:,::1](uint8[:,:,::1], UniTuple(float32[:,::1], 4), uint32[::1], uint8, float64[:,::1], uint8[::1])", parallel=True)
+def varredura_caminho_paralela(img: Image, dists: ErrorDistDir, idx: np.ndarray, inicio: int,
+                               cores: np.ndarray, lut: np.ndarray) -> Image:
+    """
+    Mesmo que ``varredura_caminho``, com cada canal de cor em uma thread. O
+    resultado é idêntico. Sem paleta de cores, e não deve ser chamada de
+    várias threads ao mesmo tempo, como no modo em lote.
+    """
+    H, W, C = img.shape
+    res = np.empty((H, W, C), dtype=np.uint8)
+    for c in prange(min(C, 3)):
+        difunde_caminho(img, res, dists, idx, inicio, cores, lut, c, c + 1)
+    # canal alfa, sem pontilhado
+    if C > 3:
+        res[..., 3:] = img[..., 3:]
+    return res
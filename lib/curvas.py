@@ -0,0 +1,163 @@
+"""
+Outras ordens de varredura, como caminhos para ``varredura_caminho``:
+curva de Morton (ordem Z), curva de Peano e serpentina por colunas.
+"""
+import numpy as np
+from .nb import jit
+
+
+# # # # # # # # #
+# Ordem Z       #
+
+@jit("uint32[::1](uint32, uint32)")
+def morton_indices(H: int, W: int) -> np.ndarray:
+    """
+    Caminho da curva de Morton (ordem Z) que encobre a imagem. Cada quadrado
+    é dividido em quatro, visitados na ordem superior esquerdo, superior
+    direito, inferior esquerdo e inferior direito. Os quadrantes fora da
+    imagem são descartados sem visitar os seus pontos.
+
+    Parâmetros
+    ----------
+    H, W: int
+        Dimensões da imagem.
+
+    Retorno
+    -------
+    idx: np.ndarray
+        Posição linear `y * W + x` de cada pixel.
+    """
+    idx = np.empty(H * W, dtype=np.uint32)
+
+    # menor potência de 2 que encobre a imagem
+    logN = 0
+    while (1 << logN) < max(H, W):
+        logN += 1
+
+    # pilha com a ordem `k` e o canto de cada quadrado pendente
+    pilha = np.empty((3 * logN + 1, 3), dtype=np.int64)
+    pilha[0] = np.int64(logN), 0, 0
+    topo = 1
+
+    j = 0
+    while topo > 0:
+        topo -= 1
+        k, x0, y0 = pilha[topo]
+        if x0 >= W or y0 >= H:
+            continue
+
+        if k == 0:
+            idx[j] = y0 * W + x0
+            j += 1
+            continue
+
+        # empilha em ordem inversa
+        n = 1 << (k - 1)
+        pilha[topo] = k - 1, x0 + n, y0 + n
+        pilha[topo + 1] = k - 1, x0, y0 + n
+        pilha[topo + 2] = k - 1, x0 + n, y0
+        pilha[topo + 3] = k - 1, x0, y0
+        topo += 4
+
+    return idx
+
+
+# # # # # # # # #
+# Peano         #
+
+@jit("uint32[::1](uint32, uint32)")
+def peano_indices(H: int, W: int) -> np.ndarray:
+    """
+    Caminho da curva de Peano que encobre a imagem. Cada quadrado é dividido
+    em 3x3, visitados em serpentina por colunas, com as cópias refletidas
+    para manter o caminho contínuo. Como na curva de Hilbert, os quadrados
+    fora da imagem são descartados sem visitar os seus pontos.
+
+    Parâmetros
+    ----------
+    H, W: int
+        Dimensões da imagem.
+
+    Retorno
+    -------
+    idx: np.ndarray
+        Posição linear `y * W + x` de cada pixel.
+    """
+    idx = np.empty(H * W, dtype=np.uint32)
+
+    # menor potência de 3 que encobre a imagem
+    log3N = 0
+    N = 1
+    while N < max(H, W):
+        log3N += 1
+        N *= 3
+
+    # pilha com as subcurvas pendentes: ordem `k`, lado `3^k` e a
+    # transformação `(x, y) -> (sx x + bx, sy y + by)` para a imagem
+    pilha = np.empty((8 * log3N + 1, 6), dtype=np.int64)
+    pilha[0] = np.int64(log3N), N, 1, 1, 0, 0
+    topo = 1
+
+    j = 0
+    while topo > 0:
+        topo -= 1
+        k, lado, sx, sy, bx, by = pilha[topo]
+
+        # quadrado coberto pela subcurva, na imagem
+        x0 = bx + min(0, sx * (lado - 1))
+        y0 = by + min(0, sy * (lado - 1))
+        if x0 >= W or y0 >= H or x0 + lado <= 0 or y0 + lado <= 0:
+            continue
+
+        if k == 0:
+            idx[j] = by * W + bx
+            j += 1
+            continue
+
+        # empilha as 9 cópias em ordem inversa: a coluna `i` é percorrida
+        # para baixo quando par e para cima quando ímpar, as cópias em linhas
+        # ímpares são refletidas em `x` e em colunas ímpares, em `y`
+        n = lado // 3
+        for c in range(8, -1, -1):
+            i = c // 3
+            j3 = c % 3 if i % 2 == 0 else 2 - c % 3
+            rx = -1 if j3 % 2 == 1 else 1
+            ry = -1 if i % 2 == 1 else 1
+            ox = (n - 1 if rx < 0 else 0) + i * n
+            oy = (n - 1 if ry < 0 else 0) + j3 * n
+            pilha[topo] = k - 1, n, sx * rx, sy * ry, bx + sx * ox, by + sy * oy
+            topo += 1
+
+    return idx
+
+
+# # # # # # # # # # # # #
+# Serpentina em colunas #
+
+@jit("uint32[::1](uint32, uint32)")
+def coluna_indices(H: int, W: int) -> np.ndarray:
+    """
+    Caminho em serpentina pelas colunas, descendo nas pares e subindo nas
+    ímpares. É a varredura alternada transposta, com passos mais longos
+    em imagens altas.
+
+    Parâmetros
+    ----------
+    H, W: int
+        Dimensões da imagem.
+
+    Retorno
+    -------
+    idx: np.ndarray
+        Posição linear `y * W + x` de cada pixel.
+    """
+    idx = np.empty(H * W, dtype=np.uint32)
+
+    j = 0
+    for x in range(W):
+        for k in range(H):
+            y = k if x % 2 == 0 else H - 1 - k
+            idx[j] = y * W + x
+            j += 1
+
+    return idx
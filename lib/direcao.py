@@ -1,8 +1,8 @@
 """
 Direções locais de aplicação das distribuições e
 rotações das matrizes das distribuições de erros.
-Para as varreduras em curvas de Hilbert e em
-espiral.
+Para as varreduras que seguem caminhos (veja
+``varredura_caminho``).
 """
 from enum import IntEnum, unique
 from typing import Tuple
@@ -102,3 +102,31 @@ def deslocamento(dir: int, H: int, W: int):
     else:
         # máscara p/ baixo: última col. no meio
         return meio(H), W-1
+
+
+@jit("uint32(uint32, uint32, uint32, uint32)")
+def direcao(x: int, ox: int, y: int, oy: int) -> int:
+    """
+    Direção de um caminho, a partir do ponto atual e do anterior. Em
+    saltos entre pontos não vizinhos, o eixo `x` tem prioridade.
+
+    Parâmetros
+    ----------
+    x, y: int
+        Ponto atual.
+    ox, oy: int
+        Ponto anterior.
+
+    Retorno
+    -------
+    dir: int
+        Direção, de acordo com a enum ``Dir``.
+    """
+    if x > ox:
+        return Dir.direita
+    elif x < ox:
+        return Dir.esquerda
+    elif y < oy:
+        return Dir.cima
+    else:
+        return Dir.baixo
@@ -0,0 +1,150 @@
+"""
+Representação esparsa das distribuições de erro, apenas com os pesos
+não nulos e seus deslocamentos em relação ao pixel atual, e as bordas
+da imagem que dispensam a checagem de limites.
+"""
+from typing import Tuple
+import numpy as np
+from tipos import ErrorDist, Image
+from .direcao import ErrorDistDir, deslocamento
+from .nb import jit
+
+
+# deslocamentos em `y` e em `x` e o peso de cada posição
+Pesos = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+@jit("Tuple((int32[::1], int32[::1], float32[::1]))(float32[:,::1], int32, int32)")
+def pesos_esparsos(dist: ErrorDist, dH: int, dW: int) -> Pesos:
+    """
+    Lista dos pesos não nulos da distribuição de erros, em ordem row-major.
+
+    Parâmetros
+    ----------
+    dist: np.ndarray
+        Matriz 2D com os pesos da distribuição de erro.
+    dH, dW: int
+        Posição do pixel atual na matriz da distribuição.
+
+    Retorno
+    -------
+    dy, dx: np.ndarray
+        Deslocamentos de cada peso em relação ao pixel atual.
+    w: np.ndarray
+        Pesos não nulos.
+    """
+    tH, tW = dist.shape
+
+    K = 0
+    for i in range(tH):
+        for j in range(tW):
+            if dist[i, j] != 0:
+                K += 1
+
+    dy = np.empty(K, dtype=np.int32)
+    dx = np.empty(K, dtype=np.int32)
+    w = np.empty(K, dtype=np.float32)
+
+    k = 0
+    for i in range(tH):
+        for j in range(tW):
+            if dist[i, j] != 0:
+                dy[k] = i - dH
+                dx[k] = j - dW
+                w[k] = dist[i, j]
+                k += 1
+    return dy, dx, w
+
+
+@jit("Tuple((int32[:,::1], int32[:,::1], float32[:,::1]))(UniTuple(float32[:,::1], 4))")
+def pesos_direcoes(dists: ErrorDistDir) -> Pesos:
+    """
+    Pesos esparsos das distribuições rotacionadas por ``err_dist_direcoes``,
+    já com o deslocamento de cada direção.
+
+    Parâmetros
+    ----------
+    dists: tuple
+        Quatro (4) matrizes 2D com `float32` em ordem row-major, com as
+        distribuições de erros para cada direção de aplicação.
+
+    Retorno
+    -------
+    dy, dx, w: np.ndarray
+        Matrizes `(4, K)` com os deslocamentos e os pesos de cada direção,
+        de acordo com a enum ``Dir``. Todas as rotações têm os mesmos `K`
+        pesos não nulos.
+    """
+    K = 0
+    for peso in dists[0].ravel():
+        if peso != 0:
+            K += 1
+
+    dy = np.empty((4, K), dtype=np.int32)
+    dx = np.empty((4, K), dtype=np.int32)
+    w = np.empty((4, K), dtype=np.float32)
+
+    for d in range(4):
+        tH, tW = dists[d].shape
+        dH, dW = deslocamento(d, tH, tW)
+        dy[d], dx[d], w[d] = pesos_esparsos(dists[d], dH, dW)
+    return dy, dx, w
+
+
+# # # # # # # # # # # # # #
+# Bordas da imagem (halo) #
+
+@jit("UniTuple(int32, 4)(int32[::1], int32[::1])")
+def margens(dy: np.ndarray, dx: np.ndarray) -> Tuple[int, int, int, int]:
+    """
+    Tamanho das bordas necessárias para que nenhum peso caia fora da imagem.
+
+    Parâmetros
+    ----------
+    dy, dx: np.ndarray
+        Deslocamentos dos pesos (todas as direções, se for o caso).
+
+    Retorno
+    -------
+    cima, baixo, esq, dir: int
+        Margem em cada um dos lados.
+    """
+    cima, baixo, esq, dir = 0, 0, 0, 0
+    for k in range(dy.size):
+        cima = max(cima, -dy[k])
+        baixo = max(baixo, dy[k])
+        esq = max(esq, -dx[k])
+        dir = max(dir, dx[k])
+    return cima, baixo, esq, dir
+
+
+@jit("float32[:,:,::1](uint8[:,:,:], int32, int32, int32, int32, int64, int64)")
+def com_halo(img: Image, cima: int, baixo: int, esq: int, dir: int, c0: int, c1: int) -> np.ndarray:
+    """
+    Cópia da imagem em ponto flutuante, cercada de bordas zeradas. Os erros
+    distribuídos nas bordas são simplesmente descartados no final, sem
+    checagem de limites a cada peso.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 3D `(H, W, C)` com `uint8`, com os canais intercalados.
+    cima, baixo, esq, dir: int
+        Margem em cada um dos lados.
+    c0, c1: int
+        Intervalo de canais copiados, sem o alfa.
+
+    Retorno
+    -------
+    buf: np.ndarray
+        Matriz 3D com `float32`, com a imagem na posição `(cima, esq)` e
+        os canais `c0` até `c1` lado a lado.
+    """
+    H, W, _ = img.shape
+    C = c1 - c0
+    buf = np.zeros((H + cima + baixo, W + esq + dir, C), dtype=np.float32)
+    for y in range(H):
+        for x in range(W):
+            for c in range(C):
+                buf[y + cima, x + esq, c] = img[y, x, c0 + c]
+    return buf
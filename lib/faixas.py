@@ -0,0 +1,61 @@
+"""
+Varreduras horizontais aproximadas, com faixas independentes em paralelo.
+"""
+from tipos import Image, ErrorDist
+import numpy as np
+from .nb import jit, prange
+from .horizontal import varredura_horizontal
+
+
+@jit("uint8[:,::1](uint8[:,::1], float32[:,::1], boolean, uint32, uint32, float64[:,::1], uint8[::1])", parallel=True)
+def varredura_faixas(img: Image, dist: ErrorDist, alternada: bool, altura: int, sobreposicao: int,
+                     cores: np.ndarray, lut: np.ndarray) -> Image:
+    """
+    Divide a imagem em faixas horizontais e aplica a varredura em cada uma
+    de forma independente, em paralelo.
+
+    Para reduzir as emendas, cada faixa começa `sobreposicao` linhas acima
+    do seu início, que servem apenas para acumular os erros que viriam da
+    faixa anterior e são descartadas. O resultado é uma aproximação da
+    varredura sequencial, exata quando a sobreposição cobre a imagem.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 2D com `uint8` em ordem row-major, representando a imagem.
+    dist: np.ndarray
+        Matriz 2D com `float32` em ordem row-major, representando a
+        distribuição de erros que deve ser feita.
+    alternada: bool
+        Usa a varredura alternada em vez da unidirecional.
+    altura: int
+        Número de linhas de cada faixa.
+    sobreposicao: int
+        Linhas extras processadas antes de cada faixa.
+    cores, lut: np.ndarray
+        Níveis da quantização, de ``lib.paletas.Paleta``, sem paleta de cores.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Imagem resultante. Matriz 2D com `uint8` em ordem row-major.
+    """
+    # dimensões da imagem
+    H, W = img.shape
+    altura = max(altura, 1)
+    # imagem resultante
+    res = np.empty((H, W), dtype=np.uint8)
+
+    for f in prange((H + altura - 1) // altura):
+        y0 = f * altura
+        y1 = min(H, y0 + altura)
+        # início com as linhas de sobreposição, sempre em linha
+        # par para manter o sentido da varredura alternada
+        ini = max(0, y0 - sobreposicao)
+        ini -= ini % 2
+
+        sub = np.copy(img[ini:y1]).reshape(y1 - ini, W, 1)
+        ans = varredura_horizontal(sub, dist, alternada, False, cores, lut)
+        # descarta a sobreposição
+        res[y0:y1] = ans[y0-ini:, :, 0]
+    return res
@@ -0,0 +1,92 @@
+"""
+Varredura unidirecional paralela em frente de onda.
+"""
+from tipos import Image, ErrorDist
+import numpy as np
+from .esparsa import pesos_esparsos, margens, com_halo
+from .nb import jit, prange
+
+
+@jit("uint8[:,::1](uint8[:,::1], float32[:,::1], uint32, float64[:,::1], uint8[::1])", parallel=True)
+def varredura_frente(img: Image, dist: ErrorDist, bloco: int, cores: np.ndarray, lut: np.ndarray) -> Image:
+    """
+    Varredura unidirecional com as linhas processadas em paralelo, cada uma
+    atrasada dois blocos de colunas em relação à linha anterior.
+
+    O pixel `(y, x)` só depende das linhas anteriores até a coluna `x + dW`,
+    então com blocos de largura pelo menos `2 dW` as linhas que executam
+    juntas nunca escrevem nas mesmas posições e cada pixel recebe os erros na
+    mesma ordem da ``varredura_unidirecional``. O resultado é idêntico.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 2D com `uint8` em ordem row-major, representando a imagem.
+    dist: np.ndarray
+        Matriz 2D com `float32` em ordem row-major, representando a
+        distribuição de erros que deve ser feita.
+    bloco: int
+        Largura mínima dos blocos de colunas. Blocos maiores reduzem a
+        sincronização, mas também o número de linhas em paralelo.
+    cores, lut: np.ndarray
+        Níveis da quantização, de ``lib.paletas.Paleta``, sem paleta de cores.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Imagem resultante. Matriz 2D com `uint8` em ordem row-major.
+    """
+    # dimensões da imagem
+    H, W = img.shape
+    # dimensões da distribuição de erros
+    tH, tW = dist.shape
+    # deslocamento em `x` do início da dist.
+    dW = (tW - 1) // 2
+    # apenas os pesos não nulos
+    dy, dx, w = pesos_esparsos(dist, 0, dW)
+    cima, baixo, esq, dir = margens(dy, dx)
+
+    # largura e quantidade de blocos
+    B = max(bloco, 2 * dW, 1)
+    nB = (W + B - 1) // B
+
+    # imagem em ponto flutuante, com bordas
+    buf = com_halo(img.reshape(H, W, 1), cima, baixo, esq, dir, 0, 1)
+    # imagem resultante
+    res = np.empty((H, W), dtype=np.uint8)
+    # com dois níveis, o limiar é a primeira intensidade do nível de cima
+    dois_niveis = cores.shape[0] == 2
+    limiar = float(np.argmax(lut)) if dois_niveis else 0.0
+    preto, branco = cores[0, 0], cores[-1, 0]
+
+    # no passo `s`, a linha `y` processa o bloco `s - 2y`
+    for s in range(nB + 2 * (H - 1)):
+        y0 = max(0, (s - nB + 2) // 2)
+        y1 = min(H - 1, s // 2)
+
+        for k in prange(y1 - y0 + 1):
+            y = y0 + k
+            yb = y + cima
+            b = s - 2 * y
+            # semelhante ao unidirecional, só no bloco
+            for x in range(b * B, min(W, (b + 1) * B)):
+                xb = x + esq
+                intensidade = buf[yb, xb, 0]
+                if dois_niveis:
+                    # apenas uma comparação com o limiar
+                    if intensidade < limiar:
+                        res[y, x] = 0
+                        erro = intensidade - preto
+                    else:
+                        res[y, x] = 1
+                        erro = intensidade - branco
+                else:
+                    # nível mais próximo, pela intensidade truncada
+                    q = lut[int(min(max(intensidade, 0.0), 255.0))]
+                    res[y, x] = q
+                    erro = intensidade - cores[q, 0]
+
+                # carregamento do erro
+                for t in range(w.size):
+                    buf[yb + dy[t], xb + dx[t], 0] += w[t] * erro
+    return res
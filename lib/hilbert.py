@@ -1,12 +1,16 @@
 """
 Varredura seguindo curvas de Hilbert.
-Não funciona corretamente.
+
+A ordem cobre a imagem com a menor curva de Hilbert quadrada que a
+contém, descartando os pontos fora dela, então cada pixel aparece uma
+única vez.
 """
-from tipos import ErrorDist, Image
-from typing import Tuple, Optional, Union, overload
+from tipos import Image
+from typing import Tuple, Optional
 
-from enum import IntEnum, unique
-from .direcao import ErrorDistDir, Dir, deslocamento
+from .direcao import ErrorDistDir, Dir
+from .caminho import varredura_caminho
+from .paletas import binaria
 from .nb import jit
 import numpy as np
 
@@ -58,33 +62,6 @@ def hilbert_prox_ind(ordem: int, idx: int) -> Tuple[int, int]:
     return x, y
 
 
-@jit("uint32(uint32, uint32, uint32, uint32)")
-def direcao(x: int, ox: int, y: int, oy: int) -> int:
-    """
-    Direção da curva de Hilbert, a partir do ponto atual e do anterior.
-
-    Parâmetros
-    ----------
-    x, y: int
-        Ponto atual.
-    ox, oy: int
-        Ponto anterior.
-
-    Retorno
-    -------
-    dir: int
-        Direção, de acordo com a enum ``Dir``.
-    """
-    if x > ox:
-        return Dir.direita
-    elif x < ox:
-        return Dir.esquerda
-    elif y < oy:
-        return Dir.cima
-    else:
-        return Dir.baixo
-
-
 @jit("uint32(uint32)")
 def log2(num: int) -> int:
     """
@@ -112,12 +89,17 @@ def log2(num: int) -> int:
         i += 1
     return i
 
-@jit("uint32[:,::1](uint32, uint32)")
+@jit("uint32[::1](uint32, uint32)")
 def hilbert_indices(H: int, W: int) -> np.ndarray:
     """
-    Monta um vetor com os índices ordenados pela curva de
-    Hilbert. Além disso, as direções (veja ``Dir``) da curva
-    também estão no vetor.
+    Monta um vetor com os pixels da imagem ordenados pela curva de Hilbert
+    que a encobre, na mesma ordem de ``hilbert_prox_ind``.
+
+    A curva de ordem `k + 1` é formada por quatro cópias da curva de ordem
+    `k`, transformadas como em ``hilbert_prox_ind``. Percorrendo essa
+    recursão com a composição das transformações, os quadrantes inteiros
+    fora da imagem são descartados sem visitar os seus pontos, então o custo
+    é proporcional a `H * W`, e não ao quadrado da maior dimensão.
 
     Parâmetros
     ----------
@@ -127,26 +109,50 @@ def hilbert_indices(H: int, W: int) -> np.ndarray:
     Retorno
     -------
     idx: np.ndarray
-        Vetor com os índices e a direção.
+        Vetor com a posição linear `y * W + x` de cada pixel, o caminho
+        de ``varredura_caminho``.
     """
-    idx = np.empty((H * W, 3), dtype=np.uint32)
+    idx = np.empty(H * W, dtype=np.uint32)
 
     # ordem da menor curva de Hilbert que encobre a imagem
     logN = log2(max(H, W))
-    # tamanho real da curva
-    N = 1 << logN
+
+    # pilha com as subcurvas pendentes: ordem `k` e a transformação
+    # `p -> A p + b` da subcurva para a imagem, com `A` uma permutação
+    # com sinais em `(axx, axy, ayx, ayy)` e `b` em `(bx, by)`
+    pilha = np.empty((3 * logN + 1, 7), dtype=np.int64)
+    pilha[0] = np.int64(logN), 1, 0, 0, 1, 0, 0
+    topo = 1
 
     j = 0
-    # índices anteriores, para cálculo da direção
-    oy, ox = hilbert_prox_ind(logN, 0)
-    # checa todos os índices da curva
-    for i in range(N * N):
-        x, y = hilbert_prox_ind(logN, i)
-        # marca apenas os que estão dentro da imagem
-        if y < H and x < W:
-            idx[j] = y, x, direcao(x, ox, y, oy)
-            oy, ox = y, x
+    while topo > 0:
+        topo -= 1
+        k, axx, axy, ayx, ayy, bx, by = pilha[topo]
+
+        # quadrado coberto pela subcurva, na imagem
+        lado = (1 << k) - 1
+        x0 = bx + min(0, (axx + axy) * lado)
+        y0 = by + min(0, (ayx + ayy) * lado)
+        if x0 >= W or y0 >= H or x0 + lado < 0 or y0 + lado < 0:
+            continue
+
+        if k == 0:
+            idx[j] = by * W + bx
             j += 1
+            continue
+
+        # empilha em ordem inversa, para visitar as cópias na ordem
+        n = 1 << (k - 1)
+        # cópia 3: (x, y) -> (2n - 1 - y, n - 1 - x)
+        pilha[topo] = (k - 1, -axy, -axx, -ayy, -ayx,
+                       bx + axx * (2*n - 1) + axy * (n - 1), by + ayx * (2*n - 1) + ayy * (n - 1))
+        # cópia 2: (x, y) -> (x + n, y + n)
+        pilha[topo + 1] = k - 1, axx, axy, ayx, ayy, bx + (axx + axy) * n, by + (ayx + ayy) * n
+        # cópia 1: (x, y) -> (x, y + n)
+        pilha[topo + 2] = k - 1, axx, axy, ayx, ayy, bx + axy * n, by + ayy * n
+        # cópia 0: (x, y) -> (y, x)
+        pilha[topo + 3] = k - 1, axy, axx, ayy, ayx, bx, by
+        topo += 4
 
     return idx
 
@@ -154,7 +160,7 @@ def hilbert_indices(H: int, W: int) -> np.ndarray:
 # # # # # # #
 # Varredura #
 
-@jit("uint8[:,::1](uint8[:,::1], UniTuple(float32[:,::1], 4), optional(uint32[:,::1]))")
+@jit("uint8[:,::1](uint8[:,::1], UniTuple(float32[:,::1], 4), optional(uint32[::1]))")
 def varredura_hilbert(img: Image, dists: ErrorDistDir, idx: Optional[np.ndarray]=None) -> Image:
     """
     Varredura pela seguindo as curvas de Hilbert.
@@ -167,44 +173,16 @@ def varredura_hilbert(img: Image, dists: ErrorDistDir, idx: Optional[np.ndarray]
         Quatro (4) matrizes 2D com `float32` em ordem row-major, com as
         distribuições de erros para cada direção de aplicação.
     idx: np.ndarray, optional
-        Índices da curva de Hilbert.
+        Índices da curva de Hilbert, de ``hilbert_indices``.
 
     Retorno
     -------
     out: np.ndarray
         Imagem resultante. Matriz 2D com `uint8` em ordem row-major.
     """
-    # dimensões da imagem
-    H, W = img.shape
-    # imagem em ponto flutuante
-    img = img.astype(np.float32)
-    # imagem resultante
-    res = np.empty((H, W), dtype=np.uint8)
-
     # cálculo dos índices, se necessário
+    H, W = img.shape
     if idx is None:
         idx = hilbert_indices(H, W)
-
-    # percorre seguindo os índices
-    for y, x, d in idx:
-        # meios tons simples
-        intensidade = img[y, x]
-        if intensidade < 128.0:
-            res[y, x] = 0
-            valor = 0.0
-        else:
-            res[y, x] = 1
-            valor = 255.0
-
-        erro = intensidade - valor
-        # carregamento do erro seguindo aquela direção
-        tH, tW = dists[d].shape
-        dH, dW = deslocamento(d, tH, tW)
-        for i in range(tH):
-            yi = y + i - dH
-            for j in range(tW):
-                xj = x + j - dW
-                # cuidado com acesso out-of-bounds
-                if 0 <= yi < H and 0 <= xj < W:
-                    img[yi, xj] += dists[d][i, j] * erro
-    return res
+    cores, lut = binaria()
+    return varredura_caminho(img.reshape(H, W, 1), dists, idx, Dir.baixo, cores, lut).reshape(H, W)
@@ -1,69 +1,366 @@
 """
 Varreduras horizontais: undirecional ou alternada.
+
+Apenas as linhas alcançadas pela distribuição de erros ficam em ponto
+flutuante, num buffer circular (anel) com uma linha por deslocamento
+vertical. A imagem original é lida diretamente, linha a linha, com os
+canais de cor intercalados e os erros de cada canal lado a lado.
+
+Os canais nunca trocam erros, exceto com uma paleta de cores. Então, um
+intervalo de canais pode ser aplicado com um anel próprio, e a versão
+paralela aplica cada canal em uma thread.
 """
 from tipos import Image, ErrorDist
 import numpy as np
-from .nb import jit
+from .esparsa import pesos_esparsos, margens
+from .bits import resultado, empacota_linha
+from .paletas import binaria
+from .nb import jit, prange, USANDO_NUMBA
 
 
-# # # # # # # # #
-# Unidirecional #
+# # # # # # # # # # # #
+# Buffer circular     #
 
-@jit("uint8[:,::1](uint8[:,::1], float32[:,::1])")
-def varredura_unidirecional(img: Image, dist: ErrorDist) -> Image:
+@jit("float32[:,::1](uint8[:,:,:], int32, int32, int32, int64, int64)")
+def anel_inicial(img: Image, linhas: int, esq: int, dir: int, c0: int, c1: int) -> np.ndarray:
     """
-    Varredura unidirecional pela imagem, reduzindo os níveis de cinza
-    e redistribuindo os erros em relação a imagem original.
+    Monta o anel com as primeiras linhas da imagem já carregadas.
 
     Parâmetros
     ----------
     img: np.ndarray
-        Matriz 2D com `uint8` em ordem row-major, representando a imagem.
+        Primeiras linhas da imagem, `(H, W, C)` com `uint8`.
+    linhas: int
+        Maior deslocamento vertical da distribuição. O anel tem uma linha
+        a mais, e as `linhas` primeiras são carregadas.
+    esq, dir: int
+        Margens laterais, que absorvem os erros fora da imagem.
+    c0, c1: int
+        Intervalo de canais com pontilhado, sem o alfa.
+
+    Retorno
+    -------
+    anel: np.ndarray
+        Matriz 2D com `float32`, a linha `y` fica na posição `y % (linhas + 1)`,
+        com o pixel `x` e canal `c0 + c` na coluna `(x + esq) * (c1 - c0) + c`.
+    """
+    H, W, _ = img.shape
+    C = c1 - c0
+    anel = np.zeros((linhas + 1, (W + esq + dir) * C), dtype=np.float32)
+    for y in range(min(linhas, H)):
+        for x in range(W):
+            for c in range(C):
+                anel[y, (x + esq) * C + c] = img[y, x, c0 + c]
+    return anel
+
+
+@jit("void(uint8[:,:,:], uint8[:,:,:], float32[:,::1], int32[::1], int32[::1], float32[::1], int32, int64, int64, boolean, boolean, float64[:,::1], uint8[::1], int64, int64)")
+def difunde_linhas(fonte: Image, res: Image, anel: np.ndarray, dy: np.ndarray, dx: np.ndarray,
+                   w: np.ndarray, esq: int, y0: int, H: int, alternada: bool, bits: bool,
+                   cores: np.ndarray, lut: np.ndarray, c0: int, c1: int) -> None:
+    """
+    Aplica a varredura nas linhas `y0` até `y0 + res.shape[0]` da imagem,
+    usando o anel montado por ``anel_inicial``. Pode ser chamada em
+    sequência, faixa a faixa, com o mesmo anel.
+
+    Antes da linha `y`, a linha `y + L` (com `L + 1` linhas no anel) é
+    carregada a partir de `fonte[y - y0]`, na posição liberada pela linha
+    `y - 1`. Assim, cada pixel recebe os erros na mesma ordem que em uma
+    cópia completa da imagem e o resultado é idêntico.
+
+    Só os pesos da própria linha são aplicados pixel a pixel. Os das linhas
+    de baixo são aplicados depois da linha, como operações vetoriais sobre
+    o vetor de erros, o que também vale sem o Numba.
+
+    Parâmetros
+    ----------
+    fonte: np.ndarray
+        Linhas `y0 + L` em diante da imagem original, `(n, W, C)` com `uint8`.
+    res: np.ndarray
+        Índices resultantes, escritos a partir de `y0`, com os mesmos canais,
+        ou um único canal com uma paleta de cores. Apenas os canais `c0` até
+        `c1` são escritos.
+    anel: np.ndarray
+        Buffer circular de ``anel_inicial``, com os mesmos canais, atualizado
+        no lugar.
+    dy, dx, w: np.ndarray
+        Pesos não nulos, de ``pesos_esparsos``.
+    esq: int
+        Margem esquerda do anel.
+    y0: int
+        Primeira linha a ser processada.
+    H: int
+        Altura total da imagem.
+    alternada: bool
+        Inverte a direção nas linhas ímpares.
+    bits: bool
+        Escreve `res` empacotado, com 1 bit por pixel, `(n, ceil(W / 8), 1)`.
+        Apenas com um canal e dois níveis.
+    cores, lut: np.ndarray
+        Quantização da saída, de ``lib.paletas.Paleta``.
+    c0, c1: int
+        Intervalo de canais aplicados. Com uma paleta de cores, devem ser
+        os três canais de cor.
+    """
+    R, Wa = anel.shape
+    L = R - 1
+    W = fonte.shape[1]
+    C = c1 - c0
+    # acesso linear ao anel
+    plano = anel.ravel()
+    # os pesos na própria linha vêm primeiro, na ordem row-major
+    K0 = 0
+    while K0 < w.size and dy[K0] == 0:
+        K0 += 1
+    # posição no anel dos pesos da própria linha e origem no vetor de erros
+    # dos pesos das linhas de baixo
+    desl = np.empty(w.size, dtype=np.int64)
+    origem = np.empty(w.size, dtype=np.int64)
+    # erros da linha atual, nas mesmas colunas do anel, espalhados nas
+    # linhas de baixo no final; as bordas zeradas deixam todos os pesos
+    # dentro do vetor
+    P = max(esq, Wa // C - W - esq) * C
+    erros = np.zeros(Wa + 2 * P, dtype=np.float64)
+    # linha atual, antes de ser empacotada
+    linha = np.empty((W, 1), dtype=np.uint8)
+    # paleta de cores, com a LUT 3D de `B` bits por canal
+    Cq = cores.shape[1]
+    conjunta = Cq > 1
+    B = 0
+    while (1 << (3 * B + 3)) <= lut.size:
+        B += 1
+    valores = cores.ravel()
+    # com dois níveis, o limiar é a primeira intensidade do nível de cima
+    dois_niveis = not conjunta and cores.shape[0] == 2
+    limiar = float(np.argmax(lut)) if dois_niveis else 0.0
+    preto, branco = float(valores[0]), float(valores[-1])
+
+    # acesso no laço sequencial; sem o Numba, os escalares do Python são
+    # bem mais rápidos que os do NumPy, com a mesma precisão
+    if USANDO_NUMBA:
+        seq, seq_erros, pesos = plano, erros, w
+    else:
+        seq = memoryview(anel).cast('B').cast('f')
+        seq_erros = memoryview(erros)
+        pesos, desl = w.tolist(), [0] * w.size
+        dy, dx, esq = dy.tolist(), dx.tolist(), int(esq)
+        valores, lut = valores.tolist(), lut.tolist()
+
+    for k in range(res.shape[0]):
+        y = y0 + k
+        # carrega a próxima linha na posição da anterior
+        r = (y + L) % R
+        anel[r, :] = 0.0
+        if y + L < H and not USANDO_NUMBA:
+            anel[r, esq * C:(esq + W) * C] = fonte[k, :, c0:c1].ravel()
+        elif y + L < H:
+            for x in range(W):
+                for c in range(C):
+                    anel[r, (x + esq) * C + c] = fonte[k, x, c0 + c]
+
+        saida = linha if bits else res[k]
+        if not USANDO_NUMBA:
+            saida = memoryview(saida)
+        # início da linha atual no anel
+        atual = (y % R) * Wa + esq * C
+        invertida = alternada and y % 2 == 1
+        for t in range(w.size):
+            # aplicação invertida da máscara nas linhas ímpares
+            ox = -dx[t] if invertida else dx[t]
+            desl[t] = ((y + dy[t]) % R) * Wa + (esq + ox) * C
+            origem[t] = P - ox * C
+
+        # apenas os pesos da própria linha dependem do pixel anterior; o
+        # laço é repetido para cada quantização, que fica fora da cadeia
+        # de dependência entre os pixels o máximo possível
+        if conjunta:
+            for xm in range(W):
+                # ordem invertida na linha
+                x = W - 1 - xm if invertida else xm
+                # cor mais próxima, pelos bits mais altos de cada canal
+                i = 0
+                for c in range(C):
+                    intensidade = seq[atual + x * C + c]
+                    i = (i << B) | (int(min(max(intensidade, 0.0), 255.0)) >> (8 - B))
+                q = lut[i]
+                saida[x, 0] = q
+
+                for c in range(C):
+                    intensidade = seq[atual + x * C + c]
+                    # carregamento do erro, sem checar os limites
+                    erro = intensidade - valores[q * Cq + c]
+                    seq_erros[P + (x + esq) * C + c] = erro
+                    for t in range(K0):
+                        seq[desl[t] + x * C + c] += pesos[t] * erro
+        elif dois_niveis:
+            for xm in range(W):
+                x = W - 1 - xm if invertida else xm
+                for c in range(C):
+                    intensidade = seq[atual + x * C + c]
+                    # apenas uma comparação com o limiar
+                    if intensidade < limiar:
+                        saida[x, c0 + c] = 0
+                        erro = intensidade - preto
+                    else:
+                        saida[x, c0 + c] = 1
+                        erro = intensidade - branco
+                    seq_erros[P + (x + esq) * C + c] = erro
+                    for t in range(K0):
+                        seq[desl[t] + x * C + c] += pesos[t] * erro
+        else:
+            for xm in range(W):
+                x = W - 1 - xm if invertida else xm
+                for c in range(C):
+                    intensidade = seq[atual + x * C + c]
+                    # nível mais próximo, pela intensidade truncada
+                    q = lut[int(min(max(intensidade, 0.0), 255.0))]
+                    saida[x, c0 + c] = q
+                    erro = intensidade - valores[q]
+                    seq_erros[P + (x + esq) * C + c] = erro
+                    for t in range(K0):
+                        seq[desl[t] + x * C + c] += pesos[t] * erro
+
+        # as linhas de baixo recebem a linha toda de uma vez, com os pesos
+        # de trás para frente: cada posição soma os erros na mesma ordem
+        # em que os pixels foram visitados, e o resultado não muda
+        t = w.size - 1
+        while t >= K0:
+            # pesos `u` até `t`, com o mesmo deslocamento vertical
+            u = t
+            while u > K0 and dy[u - 1] == dy[t]:
+                u -= 1
+            base = ((y + dy[t]) % R) * Wa
+
+            for s in range(t, u - 1, -1):
+                alvo = plano[base:base + Wa]
+                fonte_erro = erros[origem[s]:origem[s] + Wa]
+                peso = w[s]
+                if USANDO_NUMBA:
+                    for j in range(Wa):
+                        alvo[j] += peso * fonte_erro[j]
+                else:
+                    # operação vetorial do NumPy
+                    alvo += peso * fonte_erro
+            t = u - 1
+
+        if bits:
+            empacota_linha(linha.ravel(), res[k, :, 0])
+
+
+@jit("uint8[:,:,::1](uint8[:,:,::1], float32[:,::1], boolean, boolean, float64[:,::1], uint8[::1])")
+def varredura_horizontal(img: Image, dist: ErrorDist, alternada: bool, bits: bool,
+                         cores: np.ndarray, lut: np.ndarray) -> Image:
+    """
+    Varredura linha a linha, com o anel de erros, em todos os canais.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 3D `(H, W, C)` com `uint8` em ordem row-major, com os canais
+        intercalados. Com 4 canais, o alfa é copiado sem pontilhado.
     dist: np.ndarray
         Matriz 2D com `float32` em ordem row-major, representando a
         distribuição de erros que deve ser feita.
+    alternada: bool
+        Inverte a direção nas linhas ímpares.
+    bits: bool
+        Resultado empacotado, com 1 bit por pixel (ver ``lib.bits``), em
+        `(H, ceil(W / 8), 1)`. Apenas com um canal e dois níveis.
+    cores, lut: np.ndarray
+        Quantização da saída, de ``lib.paletas.Paleta``. Com uma paleta de
+        cores, a imagem deve ter 3 canais ou mais.
 
     Retorno
     -------
     out: np.ndarray
-        Imagem resultante. Matriz 2D com `uint8` em ordem row-major.
+        Índices resultantes. Matriz 3D com `uint8` em ordem row-major, com um
+        único canal com uma paleta de cores.
     """
     # dimensões da imagem
-    H, W = img.shape
+    H, W, C = img.shape
     # dimensões da distribuição de erros
     tH, tW = dist.shape
     # deslocamento em `x` do início da dist.
     dW = (tW - 1) // 2
+    # apenas os pesos não nulos
+    dy, dx, w = pesos_esparsos(dist, 0, dW)
+    _, baixo, esq, dir = margens(dy, dx)
+    if alternada:
+        # a máscara é invertida nas linhas ímpares
+        esq = dir = max(esq, dir)
 
-    # imagem em ponto flutuante, para não arredondar erros
-    img = img.astype(np.float32)
+    # apenas as linhas alcançadas pelos erros, em ponto flutuante
+    Cd = min(C, 3)
+    anel = anel_inicial(img, baixo, esq, dir, 0, Cd)
     # imagem resultante
-    res = np.empty((H, W), dtype=np.uint8)
+    if bits:
+        res = resultado(H, W, True).reshape(H, -1, 1)
+    elif cores.shape[1] > 1:
+        res = np.empty((H, W, 1), dtype=np.uint8)
+    else:
+        res = np.empty((H, W, C), dtype=np.uint8)
 
-    # aplicação em cada pixel
-    for y in range(H):
-        for x in range(W):
-            # meios tons simples
-            intensidade = img[y, x]
-            if intensidade < 128.0:
-                res[y, x] = 0
-                valor = 0.0
-            else:
-                res[y, x] = 1
-                valor = 255.0
-
-            # carregamento do erro
-            erro = intensidade - valor
-            for i in range(tH):
-                yi = y + i
-                for j in range(tW):
-                    xj = x + j - dW
-                    # cuidado com acesso out-of-bounds
-                    if 0 <= yi < H and 0 <= xj < W:
-                        img[yi, xj] += dist[i, j] * erro
+    difunde_linhas(img[baixo:], res, anel, dy, dx, w, esq, 0, H, alternada, bits, cores, lut, 0, Cd)
+    # canal alfa, sem pontilhado
+    if C > 3 and res.shape[2] == C:
+        res[..., 3:] = img[..., 3:]
     return res
 
 
+@jit("uint8[:,:,::1](uint8[:,:,::1], float32[:,::1], boolean, float64[:,::1], uint8[::1])", parallel=True)
+def varredura_horizontal_paralela(img: Image, dist: ErrorDist, alternada: bool,
+                                  cores: np.ndarray, lut: np.ndarray) -> Image:
+    """
+    Mesmo que ``varredura_horizontal``, com cada canal de cor em uma thread,
+    cada um com o seu anel. O resultado é idêntico. Sem paleta de cores nem
+    resultado empacotado, e não deve ser chamada de várias threads ao mesmo
+    tempo, como no modo em lote.
+    """
+    H, W, C = img.shape
+    tH, tW = dist.shape
+    dW = (tW - 1) // 2
+    dy, dx, w = pesos_esparsos(dist, 0, dW)
+    _, baixo, esq, dir = margens(dy, dx)
+    if alternada:
+        esq = dir = max(esq, dir)
+
+    res = np.empty((H, W, C), dtype=np.uint8)
+    for c in prange(min(C, 3)):
+        anel = anel_inicial(img, baixo, esq, dir, c, c + 1)
+        difunde_linhas(img[baixo:], res, anel, dy, dx, w, esq, 0, H, alternada, False, cores, lut, c, c + 1)
+    # canal alfa, sem pontilhado
+    if C > 3:
+        res[..., 3:] = img[..., 3:]
+    return res
+
+
+# # # # # # # # #
+# Unidirecional #
+
+@jit("uint8[:,::1](uint8[:,::1], float32[:,::1])")
+def varredura_unidirecional(img: Image, dist: ErrorDist) -> Image:
+    """
+    Varredura unidirecional pela imagem, reduzindo os níveis de cinza
+    e redistribuindo os erros em relação a imagem original.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 2D com `uint8` em ordem row-major, representando a imagem.
+    dist: np.ndarray
+        Matriz 2D com `float32` em ordem row-major, representando a
+        distribuição de erros que deve ser feita.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Imagem resultante. Matriz 2D com `uint8` em ordem row-major.
+    """
+    H, W = img.shape
+    cores, lut = binaria()
+    return varredura_horizontal(img.reshape(H, W, 1), dist, False, False, cores, lut).reshape(H, W)
+
+
 # # # # # # #
 # Alternada #
 
@@ -87,63 +384,6 @@ def varredura_alternada(img: Image, dist: ErrorDist) -> Image:
     out: np.ndarray
         Imagem resultante. Matriz 2D com `uint8` em ordem row-major.
     """
-    # dimensões da imagem
     H, W = img.shape
-    # dimensões da distribuição de erros
-    tH, tW = dist.shape
-    # deslocamento da máscara de dist. erros
-    dW = (tW - 1) // 2
-
-    # imagem em ponto flutuante
-    img = img.astype(np.float32)
-    # imagem resultante
-    res = np.empty((H, W), dtype=np.uint8)
-
-    for ym in range((H + 1)//2):
-        # aplicação nas linhas pares
-        y = 2 * ym
-        for x in range(W):
-            # semelhante ao unidirecional
-            intensidade = img[y, x]
-            if intensidade < 128.0:
-                res[y, x] = 0
-                valor = 0.0
-            else:
-                res[y, x] = 1
-                valor = 255.0
-
-            # carregamento do erro
-            erro = intensidade - valor
-            for i in range(tH):
-                yi = y + i
-                for j in range(tW):
-                    xj = x + j - dW
-                    if 0 <= yi < H and 0 <= xj < W:
-                        img[yi, xj] += dist[i, j] * erro
-
-        if y + 1 == H:
-            break
-        # aplicação nas linhas ímpares
-        y += 1
-        for xm in range(W):
-            # ordem invertida na linha
-            x = W - 1 - xm
-
-            intensidade = img[y, x]
-            if intensidade < 128.0:
-                res[y, x] = 0
-                valor = 0.0
-            else:
-                res[y, x] = 1
-                valor = 255.0
-
-            # carregamento do erro
-            erro = intensidade - valor
-            for i in range(tH):
-                yi = y + i
-                for j in range(tW):
-                    # aplicação invertida da máscara de erros
-                    xj = x + dW - j
-                    if 0 <= yi < H and 0 <= xj < W:
-                        img[yi, xj] += dist[i, j] * erro
-    return res
\ No newline at end of file
+    cores, lut = binaria()
+    return varredura_horizontal(img.reshape(H, W, 1), dist, True, False, cores, lut).reshape(H, W)
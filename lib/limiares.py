@@ -0,0 +1,278 @@
+"""
+Pontilhado ordenado, comparando cada pixel com um mapa de limiares
+repetido pela imagem.
+
+Não há dependência entre os pixels, então a aplicação é uma única passada,
+com as linhas em paralelo. Os mapas são de Bayer (matriz de dispersão
+recursiva) ou de ruído azul, gerado por *void-and-cluster*, e ficam em
+cache depois de gerados. Cada mapa vem em um ``Mapa``, que seleciona o
+pontilhado ordenado no lugar de uma distribuição de erros.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, NamedTuple
+from tipos import Image
+import numpy as np
+from .nb import jit, prange, USANDO_NUMBA
+
+
+# # # # # # # # # # # # # # #
+# Geração dos mapas         #
+
+def bayer(n: int) -> np.ndarray:
+    """
+    Ordem dos pixels na matriz de Bayer `n x n`, com `n` potência de 2.
+
+    Retorno
+    -------
+    ordem: np.ndarray
+        Matriz 2D com `int32`, com cada valor de `0` até `n^2 - 1` uma vez.
+    """
+    ordem = np.zeros((1, 1), dtype=np.int32)
+    while ordem.shape[0] < n:
+        # cada quadrante intercala a matriz anterior
+        ordem = np.block([
+            [4 * ordem,     4 * ordem + 2],
+            [4 * ordem + 3, 4 * ordem + 1],
+        ]).astype(np.int32)
+    return ordem
+
+
+@jit("int32[:,::1](int64, float64, int64[::1])")
+def vazio_e_aglomerado(n: int, sigma: float, inicial: np.ndarray) -> np.ndarray:
+    """
+    Ordem dos pixels num mapa de ruído azul `n x n`, pelo método
+    *void-and-cluster* de Ulichney.
+
+    A energia de cada posição é a soma de uma gaussiana toroidal centrada em
+    cada pixel marcado. O padrão inicial é relaxado movendo o pixel do maior
+    aglomerado para o maior vazio, depois os pixels são removidos a partir
+    dos aglomerados e inseridos a partir dos vazios, e a ordem de cada um
+    é a sua posição nessa sequência.
+
+    Parâmetros
+    ----------
+    n: int
+        Lado do mapa.
+    sigma: float
+        Desvio padrão da gaussiana, em pixels.
+    inicial: np.ndarray
+        Posições lineares marcadas no padrão inicial, sem repetição.
+
+    Retorno
+    -------
+    ordem: np.ndarray
+        Matriz 2D com `int32`, com cada valor de `0` até `n^2 - 1` uma vez.
+    """
+    N = n * n
+    # gaussiana toroidal repetida em 2x2, a centrada em `(y, x)` é a fatia
+    # `[n - y : 2n - y, n - x : 2n - x]`
+    g = np.empty((2 * n, 2 * n), dtype=np.float64)
+    for i in range(2 * n):
+        for j in range(2 * n):
+            dy = min(i % n, n - i % n)
+            dx = min(j % n, n - j % n)
+            g[i, j] = np.exp(-(dy * dy + dx * dx) / (2.0 * sigma * sigma))
+
+    energia = np.zeros((n, n), dtype=np.float64)
+    marcado = np.zeros((n, n), dtype=np.bool_)
+    for p in inicial:
+        y, x = divmod(p, n)
+        marcado[y, x] = True
+        energia += g[n-y:2*n-y, n-x:2*n-x]
+
+    # relaxamento do padrão inicial, até o aglomerado virar o vazio
+    for _ in range(N):
+        c = np.argmax(np.where(marcado, energia, -np.inf))
+        y, x = divmod(c, n)
+        marcado[y, x] = False
+        energia -= g[n-y:2*n-y, n-x:2*n-x]
+
+        v = np.argmin(np.where(marcado, np.inf, energia))
+        y, x = divmod(v, n)
+        marcado[y, x] = True
+        energia += g[n-y:2*n-y, n-x:2*n-x]
+        if v == c:
+            break
+
+    ordem = np.empty((n, n), dtype=np.int32)
+    # remoção dos aglomerados, numa cópia do padrão relaxado
+    k = np.sum(marcado)
+    e, m = energia.copy(), marcado.copy()
+    while k > 0:
+        c = np.argmax(np.where(m, e, -np.inf))
+        y, x = divmod(c, n)
+        m[y, x] = False
+        e -= g[n-y:2*n-y, n-x:2*n-x]
+        k -= 1
+        ordem[y, x] = k
+
+    # inserção nos vazios, até preencher o mapa
+    k = np.sum(marcado)
+    while k < N:
+        v = np.argmin(np.where(marcado, np.inf, energia))
+        y, x = divmod(v, n)
+        marcado[y, x] = True
+        energia += g[n-y:2*n-y, n-x:2*n-x]
+        ordem[y, x] = k
+        k += 1
+    return ordem
+
+
+def ruido_azul(n: int, sigma: float=1.5, semente: int=0) -> np.ndarray:
+    """
+    Ordem dos pixels num mapa de ruído azul `n x n`, com um décimo dos
+    pixels sorteados no padrão inicial (ver ``vazio_e_aglomerado``).
+    """
+    sorteio = np.random.default_rng(semente).permutation(n * n)
+    inicial = sorteio[:max(1, n * n // 10)].astype(np.int64)
+    return vazio_e_aglomerado(n, sigma, inicial)
+
+
+def limiares(ordem: np.ndarray) -> np.ndarray:
+    """
+    Mapa de limiares de uma matriz de ordem com `N` posições. O pixel de
+    ordem `i` fica branco com intensidade acima de `(i + 0.5) 255 / N`, então
+    uma região constante de intensidade `v` tem cerca de `v N / 255` pixels
+    brancos em cada repetição do mapa.
+
+    Retorno
+    -------
+    mapa: np.ndarray
+        Matriz 2D com `uint8` em ordem row-major.
+    """
+    N = ordem.size
+    mapa = np.floor((ordem + 0.5) * 255.0 / N)
+    return np.ascontiguousarray(mapa, dtype=np.uint8)
+
+
+# geradores dos mapas, pelo nome usado na linha de comando
+MAPAS: Dict[str, Callable[[], np.ndarray]] = {
+    'BAYER2':  lambda: limiares(bayer(2)),
+    'BAYER4':  lambda: limiares(bayer(4)),
+    'BAYER8':  lambda: limiares(bayer(8)),
+    'BAYER16': lambda: limiares(bayer(16)),
+    'AZUL':    lambda: limiares(ruido_azul(64)),
+}
+
+
+class Mapa(NamedTuple):
+    """
+    Mapa de limiares do pontilhado ordenado, aceito no lugar da distribuição
+    de erros.
+    """
+    nome: str
+    # matriz 2D com `uint8` em ordem row-major, de ``limiares``
+    limiares: np.ndarray
+
+
+def ordenado(dist: Any) -> bool:
+    """
+    Se a distribuição é um mapa de limiares, aplicada pelo pontilhado
+    ordenado, sem difusão nem varredura.
+    """
+    return isinstance(dist, Mapa)
+
+
+@lru_cache(maxsize=None)
+def mapa_limiares(nome: str) -> Mapa:
+    """
+    Mapa de limiares pelo nome, gerado uma única vez.
+
+    Erro
+    ----
+    KeyError
+        Quando o nome não está em ``MAPAS``.
+    """
+    nome = nome.upper()
+    return Mapa(nome, MAPAS[nome]())
+
+
+# # # # # # # # # # # # # # #
+# Aplicação dos limiares    #
+
+@jit("void(uint8[:,::1], uint8[::1], uint8[:,::1])")
+def limiariza_linha(linha: Image, limiar: np.ndarray, res: Image) -> None:
+    """
+    Compara uma linha `(W, C)` com a linha correspondente do mapa, repetida
+    na largura. O canal alfa, se existir, é copiado.
+    """
+    W, C = linha.shape
+    Cd = min(C, 3)
+    w = limiar.size
+
+    if not USANDO_NUMBA:
+        # operações vetoriais do NumPy
+        t = limiar[np.arange(W) % w]
+        res[:, :Cd] = linha[:, :Cd] > t[:, np.newaxis]
+        res[:, Cd:] = linha[:, Cd:]
+        return
+
+    for x in range(W):
+        t = limiar[x % w]
+        for c in range(Cd):
+            res[x, c] = 1 if linha[x, c] > t else 0
+        for c in range(Cd, C):
+            res[x, c] = linha[x, c]
+
+
+@jit("uint8[:,:,::1](uint8[:,:,::1], uint8[:,::1])")
+def limiariza(img: Image, mapa: np.ndarray) -> Image:
+    """
+    Pontilhado ordenado de uma imagem `(H, W, C)`, linha a linha.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 3D com `uint8` em ordem row-major, com os canais intercalados.
+    mapa: np.ndarray
+        Matriz de limiares de um ``Mapa``.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Imagem resultante, com 0 e 1 nos canais de cor.
+    """
+    H = img.shape[0]
+    h = mapa.shape[0]
+    res = np.empty_like(img)
+    for y in range(H):
+        limiariza_linha(img[y], mapa[y % h], res[y])
+    return res
+
+
+@jit("uint8[:,:,::1](uint8[:,:,::1], uint8[:,::1])", parallel=True)
+def limiariza_paralelo(img: Image, mapa: np.ndarray) -> Image:
+    """
+    Mesmo que ``limiariza``, com as linhas em paralelo.
+    """
+    H = img.shape[0]
+    h = mapa.shape[0]
+    res = np.empty_like(img)
+    for y in prange(H):
+        limiariza_linha(img[y], mapa[y % h], res[y])
+    return res
+
+
+def pontilhado_ordenado(img: Image, mapa: Mapa, paralelo: bool=True) -> Image:
+    """
+    Pontilhado ordenado de uma imagem em escala de cinza ou colorida.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Matriz 2D ou 3D (BGR ou BGRA) com `uint8`.
+    mapa: Mapa
+        Mapa de limiares, de ``mapa_limiares``.
+    paralelo: bool, opcional
+        Linhas em paralelo. Deve ser falso quando chamado de várias threads
+        ao mesmo tempo, como no modo em lote.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Imagem resultante, com as mesmas dimensões.
+    """
+    H, W = img.shape[:2]
+    kernel = limiariza_paralelo if paralelo else limiariza
+    res = kernel(np.ascontiguousarray(img).reshape(H, W, -1), mapa.limiares)
+    return res.reshape(img.shape)
@@ -0,0 +1,153 @@
+"""
+Momentos conjuntos de duas imagens, numa única passada, para as métricas
+de qualidade (veja ``metricas.py``).
+"""
+from tipos import Image
+import numpy as np
+from .nb import jit, USANDO_NUMBA
+
+
+# posições de cada soma no vetor de ``momentos``
+SOMA_F, SOMA_G, SOMA_FF, SOMA_GG, SOMA_FG, IGUAIS = range(6)
+
+
+@jit("int64[::1](uint8[::1], uint8[::1])")
+def momentos(f: Image, g: Image) -> np.ndarray:
+    """
+    Somas de `f`, `g`, `f^2`, `g^2`, `f g` e a quantidade de posições com
+    `f == g`, todas em uma única passada.
+
+    As somas são inteiras, então são exatas e não dependem da ordem. Até
+    cerca de 10^14 pixels, nenhuma estoura o `int64`.
+
+    Parâmetros
+    ----------
+    f, g: np.ndarray
+        Vetores com `uint8` do mesmo tamanho, como as imagens em `ravel`.
+
+    Retorno
+    -------
+    somas: np.ndarray
+        Vetor com as seis somas em `int64`, nas posições `SOMA_F`, `SOMA_G`,
+        `SOMA_FF`, `SOMA_GG`, `SOMA_FG` e `IGUAIS`.
+    """
+    somas = np.zeros(6, dtype=np.int64)
+
+    if not USANDO_NUMBA:
+        # operações vetoriais do NumPy
+        a, b = f.astype(np.int64), g.astype(np.int64)
+        somas[:] = a.sum(), b.sum(), (a * a).sum(), (b * b).sum(), (a * b).sum(), (a == b).sum()
+        return somas
+
+    sf = sg = sff = sgg = sfg = iguais = 0
+    for i in range(f.size):
+        a = np.int64(f[i])
+        b = np.int64(g[i])
+        sf += a
+        sg += b
+        sff += a * a
+        sgg += b * b
+        sfg += a * b
+        iguais += 1 if a == b else 0
+
+    somas[SOMA_F] = sf
+    somas[SOMA_G] = sg
+    somas[SOMA_FF] = sff
+    somas[SOMA_GG] = sgg
+    somas[SOMA_FG] = sfg
+    somas[IGUAIS] = iguais
+    return somas
+
+
+@jit("void(uint8[:,::1], uint8[:,::1], int64, float32[:,::1], float32[:,::1])")
+def mapas_locais(f: Image, g: Image, raio: int, ssim: np.ndarray, mse: np.ndarray) -> None:
+    """
+    SSIM e erro quadrático médio em janelas `(2 raio + 1)^2` centradas em
+    cada pixel, cortadas nas bordas.
+
+    As somas da janela vêm de um filtro de caixa separável: as somas de
+    cada coluna nas linhas da janela são atualizadas ao descer uma linha,
+    e as somas das colunas viram prefixos para a janela horizontal. Assim,
+    o custo por pixel não depende do raio, e a memória extra é de algumas
+    linhas. As somas são inteiras e exatas. Sem o Numba, as mesmas somas
+    saem de imagens integrais do NumPy.
+
+    Parâmetros
+    ----------
+    f, g: np.ndarray
+        Matrizes 2D com `uint8` e as mesmas dimensões.
+    raio: int
+        Raio da janela.
+    ssim, mse: np.ndarray
+        Mapas resultantes, com as mesmas dimensões, em `float32`.
+    """
+    H, W = f.shape
+    C1 = (0.01 * 255.0) ** 2
+    C2 = (0.03 * 255.0) ** 2
+
+    if not USANDO_NUMBA:
+        # imagens integrais, com uma linha e uma coluna de zeros no início
+        a, b = f.astype(np.int64), g.astype(np.int64)
+        integral = np.zeros((5, H + 1, W + 1), dtype=np.int64)
+        integral[0, 1:, 1:] = a.cumsum(axis=0).cumsum(axis=1)
+        integral[1, 1:, 1:] = b.cumsum(axis=0).cumsum(axis=1)
+        integral[2, 1:, 1:] = (a * a).cumsum(axis=0).cumsum(axis=1)
+        integral[3, 1:, 1:] = (b * b).cumsum(axis=0).cumsum(axis=1)
+        integral[4, 1:, 1:] = (a * b).cumsum(axis=0).cumsum(axis=1)
+
+        # limites das janelas, com as bordas cortadas
+        ys, xs = np.arange(H), np.arange(W)
+        y0 = np.maximum(ys - raio, 0).reshape(-1, 1)
+        y1 = np.minimum(ys + raio + 1, H).reshape(-1, 1)
+        x0 = np.maximum(xs - raio, 0).reshape(1, -1)
+        x1 = np.minimum(xs + raio + 1, W).reshape(1, -1)
+        n = ((y1 - y0) * (x1 - x0)).astype(np.float64)
+        somas = (integral[:, y1, x1] - integral[:, y0, x1] - integral[:, y1, x0] + integral[:, y0, x0]) / n
+        mf, mg, ff, gg, fg = somas[0], somas[1], somas[2], somas[3], somas[4]
+        vf, vg, cfg = ff - mf * mf, gg - mg * mg, fg - mf * mg
+        ssim[:] = ((2 * mf * mg + C1) * (2 * cfg + C2)) / ((mf * mf + mg * mg + C1) * (vf + vg + C2))
+        mse[:] = ff - 2 * fg + gg
+        return
+
+    # somas de f, g, f^2, g^2 e f g em cada coluna, nas linhas da janela
+    colunas = np.zeros((5, W), dtype=np.int64)
+    # prefixos das somas das colunas
+    prefixo = np.zeros((5, W + 1), dtype=np.int64)
+
+    def acumula(y: int, sinal: int) -> None:
+        for x in range(W):
+            a = np.int64(f[y, x])
+            b = np.int64(g[y, x])
+            colunas[0, x] += sinal * a
+            colunas[1, x] += sinal * b
+            colunas[2, x] += sinal * a * a
+            colunas[3, x] += sinal * b * b
+            colunas[4, x] += sinal * a * b
+
+    for y in range(min(raio, H)):
+        acumula(y, 1)
+
+    for y in range(H):
+        # a janela passa a ser `[y - raio, y + raio]`
+        if y + raio < H:
+            acumula(y + raio, 1)
+        if y - raio - 1 >= 0:
+            acumula(y - raio - 1, -1)
+        linhas = min(y + raio, H - 1) - max(y - raio, 0) + 1
+
+        for k in range(5):
+            for x in range(W):
+                prefixo[k, x + 1] = prefixo[k, x] + colunas[k, x]
+
+        for x in range(W):
+            x0, x1 = max(x - raio, 0), min(x + raio + 1, W)
+            n = float(linhas * (x1 - x0))
+            mf = (prefixo[0, x1] - prefixo[0, x0]) / n
+            mg = (prefixo[1, x1] - prefixo[1, x0]) / n
+            ff = (prefixo[2, x1] - prefixo[2, x0]) / n
+            gg = (prefixo[3, x1] - prefixo[3, x0]) / n
+            fg = (prefixo[4, x1] - prefixo[4, x0]) / n
+
+            vf, vg, cfg = ff - mf * mf, gg - mg * mg, fg - mf * mg
+            ssim[y, x] = ((2 * mf * mg + C1) * (2 * cfg + C2)) / ((mf * mf + mg * mg + C1) * (vf + vg + C2))
+            mse[y, x] = ff - 2 * fg + gg
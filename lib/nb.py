@@ -1,11 +1,19 @@
 """
 Tratamento da biblioteca Numba, em caso de não ser encontrada.
+
+Os kernels são compilados na importação, com as assinaturas explícitas, e
+guardados no cache do Numba. O diretório do cache segue a variável
+`NUMBA_CACHE_DIR`, que pode apontar para um cache já aquecido (veja
+``aquecer.py``).
 """
 # funcionamento correto da biblioteca
 try:
-    from numba import jit as nb_jit, prange
+    from numba import jit as nb_jit, prange, get_num_threads
+    from numba.core.config import DISABLE_JIT
+    from numba.core.caching import FunctionCache
 
-    USANDO_NUMBA = True
+    # com `NUMBA_DISABLE_JIT=1`, o Numba devolve as funções em Python
+    USANDO_NUMBA = not DISABLE_JIT
 
 # biblioteca inexistente, cria funções com mesma API, mas que não
 # fazem nada no código, apenas continuam a execução e Python puro
@@ -16,11 +24,41 @@ except ImportError:
     prange = range
     USANDO_NUMBA = False
 
+    def get_num_threads() -> int:
+        return 1
+
+
+
+def _com_cache(func) -> bool:
+    """
+    Se o Numba encontra um diretório com escrita para o cache da função,
+    checado antes da compilação.
+    """
+    if not USANDO_NUMBA:
+        return False
+    try:
+        FunctionCache(func)
+    # nenhum localizador do cache aceita o arquivo da função
+    except RuntimeError:
+        return False
+    return True
 
 
 def jit(signature: str, *, parallel=False, locals={}):
     """
-    Wrapper da ``numba.jit``, com opções padrões diferentes.
+    Wrapper da ``numba.jit``, com opções padrões diferentes. Sem nenhum
+    diretório de cache com escrita, a função é compilada sem cache.
+    """
+    opcoes = dict(locals=locals, parallel=parallel, error_model='numpy',
+                  nopython=True, nogil=True, fastmath=True)
+
+    def decorador(func):
+        return nb_jit(signature, cache=_com_cache(func), **opcoes)(func)
+    return decorador
+
+
+def threads() -> int:
+    """
+    Threads disponíveis para os kernels paralelos, uma sem o JIT.
     """
-    return nb_jit(signature, locals=locals, parallel=parallel, error_model='numpy',
-                  nopython=True, nogil=True, cache=True, fastmath=True)
+    return get_num_threads() if USANDO_NUMBA else 1
@@ -0,0 +1,152 @@
+"""
+Cache das ordens de varredura que dependem apenas das dimensões da imagem.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+import os, tempfile
+import numpy as np
+
+from .direcao import Dir
+from .hilbert import hilbert_indices
+from .espiral import espiral_indices
+from .curvas import morton_indices, peano_indices, coluna_indices
+
+
+# geradores de cada variante, `(H, W) -> uint32[::1]` com as posições lineares,
+# com os mesmos nomes da ``Varredura``
+GERADORES: Dict[str, Callable[[int, int], np.ndarray]] = {
+    'hilbert': hilbert_indices,
+    'espiral': espiral_indices,
+    'morton':  morton_indices,
+    'peano':   peano_indices,
+    'coluna':  coluna_indices,
+}
+# variantes que passam mais de uma vez por alguns pixels, as demais são
+# permutações das posições
+REPETEM = frozenset({'espiral'})
+# direção do primeiro passo de cada variante, que não tem ponto anterior
+INICIO: Dict[str, Dir] = {
+    'hilbert': Dir.baixo,
+    'espiral': Dir.direita,
+    'morton':  Dir.direita,
+    'peano':   Dir.baixo,
+    'coluna':  Dir.baixo,
+}
+# limite padrão, em bytes, das ordens mantidas em memória
+LIMITE_ORDENS = 256 << 20
+# muda quando algum gerador muda a ordem, invalidando os arquivos antigos
+VERSAO_ORDENS = 1
+
+
+class CacheOrdens:
+    """
+    Cache LRU das ordens de varredura, com chave `(variante, H, W)`, seguro
+    entre threads.
+
+    Com um diretório, cada ordem também é gravada em um `.npy` e lida mapeada
+    na memória (em cópia na escrita), então execuções seguintes e processos
+    concorrentes compartilham a mesma cópia sem gerar a ordem de novo.
+
+    Parâmetros
+    ----------
+    limite: int, opcional
+        Tamanho máximo, em bytes, das ordens mantidas em memória. A ordem
+        mais recente sempre fica, mesmo acima do limite.
+    diretorio: str, opcional
+        Diretório dos arquivos `.npy`, criado quando necessário.
+    """
+    def __init__(self, limite: int=LIMITE_ORDENS, diretorio: Optional[str]=None):
+        self.limite = limite
+        self.diretorio = diretorio
+        self._ordens: 'OrderedDict[Tuple[str, int, int], np.ndarray]' = OrderedDict()
+        self._bytes = 0
+        self._trava = Lock()
+
+    def __call__(self, variante: str, H: int, W: int) -> np.ndarray:
+        """
+        Ordem de varredura da variante para uma imagem `H x W`.
+
+        Erro
+        ----
+        KeyError
+            Quando a variante não tem gerador em ``GERADORES``.
+        """
+        chave = (variante, H, W)
+        with self._trava:
+            ordem = self._ordens.get(chave)
+            if ordem is not None:
+                self._ordens.move_to_end(chave)
+                return ordem
+
+        # gerada fora da trava, outras threads podem repetir o trabalho
+        ordem = self._carrega(chave)
+        if ordem is None:
+            ordem = GERADORES[variante](H, W)
+            self._grava(chave, ordem)
+
+        with self._trava:
+            if chave not in self._ordens:
+                self._ordens[chave] = ordem
+                self._bytes += ordem.nbytes
+            # descarta as menos usadas
+            while self._bytes > self.limite and len(self._ordens) > 1:
+                _, antiga = self._ordens.popitem(last=False)
+                self._bytes -= antiga.nbytes
+        return ordem
+
+    def limpa(self) -> None:
+        """
+        Descarta as ordens em memória, mantendo os arquivos.
+        """
+        with self._trava:
+            self._ordens.clear()
+            self._bytes = 0
+
+    def _arquivo(self, chave: Tuple[str, int, int]) -> Optional[str]:
+        if self.diretorio is None:
+            return None
+        variante, H, W = chave
+        return os.path.join(self.diretorio, f'{variante}-v{VERSAO_ORDENS}-{H}x{W}.npy')
+
+    def _carrega(self, chave: Tuple[str, int, int]) -> Optional[np.ndarray]:
+        arquivo = self._arquivo(chave)
+        if arquivo is None or not os.path.exists(arquivo):
+            return None
+        try:
+            ordem = np.load(arquivo, mmap_mode='c', allow_pickle=False)
+        # arquivo corrompido é gerado de novo
+        except (OSError, ValueError):
+            return None
+
+        if ordem.dtype != np.uint32 or ordem.ndim != 1:
+            return None
+        # índices fora da imagem seriam lidos sem checagem pelos kernels
+        variante, H, W = chave
+        tamanho_ok = ordem.size >= H * W if variante in REPETEM else ordem.size == H * W
+        if not tamanho_ok or (ordem.size > 0 and ordem.max() >= H * W):
+            return None
+        return ordem
+
+    def _grava(self, chave: Tuple[str, int, int], ordem: np.ndarray) -> None:
+        arquivo = self._arquivo(chave)
+        if arquivo is None:
+            return
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.npy', dir=self.diretorio)
+        # sem o arquivo, a ordem só fica em memória
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                np.save(out, ordem, allow_pickle=False)
+            # escrita atômica, processos concorrentes nunca leem pela metade
+            os.replace(tmp, arquivo)
+        except OSError:
+            os.unlink(tmp)
+
+
+# cache compartilhado pelas varreduras
+ORDENS = CacheOrdens()
@@ -0,0 +1,190 @@
+"""
+Quantização do resultado: níveis por canal ou paleta de cores.
+
+Cada kernel busca o valor de saída numa tabela (LUT) pré-calculada, em vez
+de procurar o nível ou a cor mais próxima a cada pixel. Com níveis por
+canal, a LUT tem uma entrada por intensidade truncada, `0` a `255`, com o
+nível mais próximo da intensidade já truncada. O limiar binário segue em
+128, como no pontilhado original, então `42.7` fica no nível de `42` com
+``niveis(4)``, mesmo mais perto de `85`. Com uma paleta de cores, a LUT é
+uma grade 3D com `BITS_LUT` bits por canal, com a cor mais próxima do
+centro de cada célula.
+
+O resultado das varreduras é o índice do nível (ou da cor) de cada pixel,
+convertido para a imagem final por ``Paleta.expande``.
+"""
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+from tipos import Image
+import os, re
+import numpy as np
+from .nb import jit
+
+
+# bits por canal na LUT 3D das paletas de cores
+BITS_LUT = 5
+
+
+class Paleta(NamedTuple):
+    """
+    Valores de saída da quantização, com a LUT do mais próximo.
+
+    Atributos
+    ---------
+    cores: np.ndarray
+        Matriz `(K, 1)` com os níveis de cada canal, em ordem crescente, ou
+        `(K, 3)` com as cores BGR da paleta, em `float64`.
+    lut: np.ndarray
+        Vetor com `uint8` com o índice mais próximo: 256 entradas com níveis
+        por canal ou `2^(3 BITS_LUT)` com uma paleta de cores.
+    """
+    cores: np.ndarray
+    lut: np.ndarray
+
+    @property
+    def conjunta(self) -> bool:
+        """
+        Paleta de cores, com os canais quantizados juntos.
+        """
+        return self.cores.shape[1] > 1
+
+    def expande(self, res: Image) -> Image:
+        """
+        Imagem final a partir dos índices de uma varredura. Com uma paleta de
+        cores, o resultado ganha os três canais BGR. Um canal alfa, que já
+        está completo, é mantido.
+        """
+        cores = self.cores.astype(np.uint8)
+        if self.conjunta:
+            return cores[res]
+        elif res.ndim == 3 and res.shape[2] > 3:
+            img = res.copy()
+            img[..., :3] = cores[res[..., :3], 0]
+            return img
+        return cores[res, 0]
+
+
+@lru_cache(maxsize=None)
+def niveis(n: int) -> Paleta:
+    """
+    Quantização em `n` níveis igualmente espaçados em cada canal, de `0` a
+    `255`. Com `n = 2`, é o limiar em 128 original.
+
+    Erro
+    ----
+    ValueError
+        Quando `n` não está entre 2 e 256.
+    """
+    if not 2 <= n <= 256:
+        msg = f'número de níveis inválido: {n}'
+        raise ValueError(msg)
+
+    valores = np.round(np.arange(n) * 255.0 / (n - 1))
+    # o nível `i + 1` começa no ponto médio, arredondado para cima, então
+    # a intensidade truncada já decide o nível
+    cortes = (valores[:-1] + valores[1:] + 1) // 2
+    lut = np.searchsorted(cortes, np.arange(256), side='right')
+    return Paleta(valores.reshape(n, 1), lut.astype(np.uint8))
+
+
+@lru_cache(maxsize=32)
+def paleta(cores: Tuple[Tuple[int, int, int], ...]) -> Paleta:
+    """
+    Quantização nas cores da paleta, com a LUT 3D gerada uma vez para cada
+    paleta.
+
+    Parâmetros
+    ----------
+    cores: tuple
+        Cores BGR da paleta, de 1 a 256.
+
+    Erro
+    ----
+    ValueError
+        Quando o número de cores é inválido.
+    """
+    if not 1 <= len(cores) <= 256:
+        msg = f'paleta com {len(cores)} cores, deve ter entre 1 e 256'
+        raise ValueError(msg)
+    valores = np.asarray(cores, dtype=np.float64).reshape(-1, 3)
+
+    # centro de cada célula da grade, em ordem `(b, g, r)`
+    n = 1 << BITS_LUT
+    passo = 256 // n
+    centro = np.arange(n) * passo + (passo - 1) / 2
+    b, g, r = np.meshgrid(centro, centro, centro, indexing='ij')
+    grade = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1)
+
+    # cor mais próxima de cada célula, em blocos para limitar a memória
+    lut = np.empty(n * n * n, dtype=np.uint8)
+    for i in range(0, lut.size, 4096):
+        dist = ((grade[i:i+4096, np.newaxis, :] - valores[np.newaxis]) ** 2).sum(axis=2)
+        lut[i:i+4096] = np.argmin(dist, axis=1)
+    return Paleta(valores, lut)
+
+
+def em_rgb(cores: Paleta) -> Paleta:
+    """
+    A mesma paleta, para imagens com os canais em ordem RGB (como os
+    arquivos PPM). Níveis por canal não mudam.
+    """
+    if not cores.conjunta:
+        return cores
+    return paleta(tuple(tuple(int(v) for v in cor[::-1]) for cor in cores.cores))
+
+
+def web() -> Paleta:
+    """
+    Paleta *web-safe*, com 6 níveis em cada canal (216 cores).
+    """
+    niv = range(0, 256, 51)
+    return paleta(tuple((b, g, r) for b in niv for g in niv for r in niv))
+
+
+# quantização padrão, binária em cada canal
+BINARIA = niveis(2)
+
+
+@jit("Tuple((float64[:,::1], uint8[::1]))()")
+def binaria() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Os mesmos `cores` e `lut` de ``BINARIA``, para os kernels de canal único
+    chamados sem quantização.
+    """
+    cores = np.empty((2, 1), dtype=np.float64)
+    cores[0, 0] = 0.0
+    cores[1, 0] = 255.0
+    lut = np.zeros(256, dtype=np.uint8)
+    lut[128:] = 1
+    return cores, lut
+
+
+def por_nome(nome: str) -> Paleta:
+    """
+    Quantização a partir da linha de comando: um número de níveis por canal
+    (ex.: `4`), `web` para a paleta *web-safe*, uma lista de cores RGB em
+    hexadecimal separadas por vírgula (ex.: `#000000,#ff8000,#ffffff`) ou
+    um arquivo com uma cor por linha.
+
+    Erro
+    ----
+    ValueError
+        Quando a descrição não é válida.
+    """
+    if nome.isdecimal():
+        return niveis(int(nome))
+    elif nome.lower() == 'web':
+        return web()
+
+    texto = nome
+    if os.path.isfile(nome):
+        with open(nome) as arquivo:
+            texto = arquivo.read()
+    hexas = re.findall(r'#?\b([0-9a-fA-F]{6})\b', texto)
+    if not hexas:
+        msg = f'quantização inválida: {nome}'
+        raise ValueError(msg)
+
+    # RGB em hexadecimal para BGR
+    cores = tuple((int(h[4:6], 16), int(h[2:4], 16), int(h[0:2], 16)) for h in hexas)
+    return paleta(cores)
@@ -0,0 +1,127 @@
+"""
+Medição das etapas de uma execução: tempo, memória alocada e compilação
+dos kernels, com o registro em uma linha JSON.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import sys, json, time, tracemalloc
+
+
+def kernels() -> List[Tuple[str, Any]]:
+    """
+    Kernels compilados da ``lib``, como `(nome, dispatcher)`. Sem o Numba,
+    a lista é vazia.
+    """
+    try:
+        from numba.core.dispatcher import Dispatcher
+    except ImportError:
+        return []
+
+    encontrados = {}
+    for nome, modulo in sorted(sys.modules.items()):
+        if nome != 'lib' and not nome.startswith('lib.'):
+            continue
+        for atributo in vars(modulo).values():
+            if isinstance(atributo, Dispatcher):
+                chave = f'{atributo.py_func.__module__}.{atributo.__name__}'
+                encontrados[chave] = atributo
+    return sorted(encontrados.items())
+
+
+def compilacao() -> Dict[str, int]:
+    """
+    Quantas assinaturas dos kernels foram compiladas no processo e quantas
+    foram carregadas do cache do Numba.
+    """
+    compilados = carregados = 0
+    for _, kernel in kernels():
+        compilados += sum(kernel.stats.cache_misses.values())
+        carregados += sum(kernel.stats.cache_hits.values())
+    return {'compilados': compilados, 'do_cache': carregados}
+
+
+def pico_rss() -> Optional[int]:
+    """
+    Maior memória residente do processo até agora, em bytes. Indisponível
+    fora dos sistemas POSIX.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # em KiB no Linux, em bytes no macOS
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+class Perfil:
+    """
+    Tempo e memória de cada etapa de uma execução.
+
+    A memória é a maior alocação feita pelo Python e pelo NumPy durante a
+    etapa, acompanhada pelo ``tracemalloc``. Os arrays alocados dentro dos
+    kernels do Numba não passam por ele e só aparecem no pico de RSS. Com
+    várias threads, as alocações de uma etapa se misturam com as das
+    outras, então a memória deve ser desligada.
+
+    Parâmetros
+    ----------
+    memoria: bool, opcional
+        Acompanha as alocações das etapas, iniciando o ``tracemalloc``.
+    """
+    def __init__(self, memoria: bool=True):
+        self.memoria = memoria
+        self.etapas: Dict[str, Dict[str, float]] = {}
+        self.inicio = time.perf_counter()
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def adiciona(self, nome: str, segundos: float, alocado: Optional[int]=None) -> None:
+        """
+        Soma uma medida à etapa, que pode se repetir.
+        """
+        etapa = self.etapas.setdefault(nome, {'s': 0.0, 'alocado': None})
+        etapa['s'] += segundos
+        if alocado is not None:
+            etapa['alocado'] = max(etapa['alocado'] or 0, alocado)
+
+    @contextmanager
+    def etapa(self, nome: str) -> Iterator[None]:
+        """
+        Mede o bloco como a etapa `nome`. As etapas não devem ser aninhadas,
+        porque o pico de alocação é reiniciado em cada uma.
+        """
+        base = None
+        if self.memoria and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            alocado = None
+            if base is not None:
+                _, pico = tracemalloc.get_traced_memory()
+                alocado = pico - base
+            self.adiciona(nome, segundos, alocado)
+
+    def registro(self, **extra) -> Dict[str, Any]:
+        """
+        Medidas de todas as etapas, com o tempo total desde a criação, o
+        pico de RSS do processo e a compilação dos kernels.
+        """
+        return {
+            **extra,
+            'etapas': self.etapas,
+            'total_s': time.perf_counter() - self.inicio,
+            'pico_rss': pico_rss(),
+            'kernels': compilacao(),
+        }
+
+    def json(self, **extra) -> str:
+        """
+        Registro em uma única linha JSON.
+        """
+        return json.dumps(self.registro(**extra), default=str)
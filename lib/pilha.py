@@ -0,0 +1,61 @@
+"""
+Pontilhado de pilhas de imagens do mesmo tamanho, em uma única chamada.
+
+Cada imagem é independente, então a pilha é dividida entre as threads do
+Numba, e cada imagem segue o kernel sequencial da sua varredura. Com
+muitas imagens pequenas, isso evita o custo de despacho e de alocação de
+uma chamada por imagem e usa todos os núcleos, não só um por canal.
+"""
+from tipos import ErrorDist
+import numpy as np
+from .nb import jit, prange
+from .horizontal import varredura_horizontal
+from .caminho import varredura_caminho
+from .direcao import ErrorDistDir
+from .limiares import limiariza
+
+
+@jit("uint8[:,:,:,::1](uint8[:,:,:,::1], float32[:,::1], boolean, float64[:,::1], uint8[::1])", parallel=True)
+def pilha_horizontal(imgs: np.ndarray, dist: ErrorDist, alternada: bool,
+                     cores: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """
+    Varredura horizontal (ver ``varredura_horizontal``) de cada imagem de
+    uma pilha `(N, H, W, C)`, com as imagens em paralelo.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Índices resultantes, em `(N, H, W, C)`, ou `(N, H, W, 1)` com uma
+        paleta de cores.
+    """
+    N, H, W, C = imgs.shape
+    res = np.empty((N, H, W, 1 if cores.shape[1] > 1 else C), dtype=np.uint8)
+    for n in prange(N):
+        res[n] = varredura_horizontal(imgs[n], dist, alternada, False, cores, lut)
+    return res
+
+
+@jit("uint8[:,:,:,::1](uint8[:,:,:,::1], UniTuple(float32[:,::1], 4), uint32[::1], uint8, float64[:,::1], uint8[::1])", parallel=True)
+def pilha_caminho(imgs: np.ndarray, dists: ErrorDistDir, idx: np.ndarray, inicio: int,
+                  cores: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """
+    Varredura por caminho (ver ``varredura_caminho``) de cada imagem de uma
+    pilha `(N, H, W, C)`, todas com o mesmo caminho, em paralelo.
+    """
+    N, H, W, C = imgs.shape
+    res = np.empty((N, H, W, 1 if cores.shape[1] > 1 else C), dtype=np.uint8)
+    for n in prange(N):
+        res[n] = varredura_caminho(imgs[n], dists, idx, inicio, cores, lut)
+    return res
+
+
+@jit("uint8[:,:,:,::1](uint8[:,:,:,::1], uint8[:,::1])", parallel=True)
+def pilha_ordenado(imgs: np.ndarray, mapa: np.ndarray) -> np.ndarray:
+    """
+    Pontilhado ordenado (ver ``limiariza``) de cada imagem de uma pilha
+    `(N, H, W, C)`, em paralelo.
+    """
+    res = np.empty_like(imgs)
+    for n in prange(imgs.shape[0]):
+        res[n] = limiariza(imgs[n], mapa)
+    return res
@@ -0,0 +1,259 @@
+"""
+Execução em lote dos pontilhados, em um único processo.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, TextIO, Tuple, Union
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os, sys
+import cv2
+
+from tipos import Image, ErrorDist
+from inout import imgread, imgwrite
+from lib import Varredura, Mapa, ordenado, pontilhado_ordenado
+from lib.paletas import Paleta, BINARIA
+from lib.perfil import Perfil
+from lib.cache import Cache
+from dists import por_nome, nome_de
+
+
+class Tarefa(NamedTuple):
+    """
+    Uma aplicação de meios-tons, com todos os arquivos de saída.
+    """
+    entrada: str
+    modo: int
+    varredura: Varredura
+    dist: Union[ErrorDist, Mapa]
+    saidas: List[str]
+    paleta: Paleta = BINARIA
+
+
+# nomes dos modos de leitura, nos registros
+MODOS = {cv2.IMREAD_GRAYSCALE: 'cinza', cv2.IMREAD_COLOR: 'cor', cv2.IMREAD_UNCHANGED: 'alfa'}
+
+
+def descricao(tarefa: Tarefa) -> Dict[str, Any]:
+    """
+    Campos que identificam a tarefa no registro do perfil.
+    """
+    return {
+        'entrada': tarefa.entrada,
+        'saidas': tarefa.saidas,
+        'modo': MODOS.get(tarefa.modo, tarefa.modo),
+        'varredura': tarefa.varredura.name,
+        'dist': nome_de(tarefa.dist),
+        'cores': len(tarefa.paleta.cores),
+    }
+
+
+# # # # # # # # # # # # # #
+# Geração das tarefas     #
+
+def tarefas_build(entradas: Iterable[str], varreduras: Iterable[Varredura],
+                  dists: Iterable[str], build: str='build', colorida: bool=True,
+                  paleta: Paleta=BINARIA) -> List[Tarefa]:
+    """
+    Monta as tarefas de todas as combinações de entrada, varredura e distribuição,
+    com as saídas no mesmo layout gerado pelo ``build.sh``.
+
+    Parâmetros
+    ----------
+    entradas: iterável de str
+        Caminho das imagens de entrada.
+    varreduras: iterável de Varredura
+        Modos de varredura aplicados.
+    dists: iterável de str
+        Nomes das distribuições de erro ou dos mapas de limiares, usados
+        também nas pastas de saída.
+    build: str, opcional
+        Pasta base das saídas.
+    colorida: bool, opcional
+        Se falso, gera apenas as saídas em escala de cinza.
+    paleta: Paleta, opcional
+        Quantização das saídas. Com uma paleta de cores, não há saídas em
+        escala de cinza.
+
+    Retorno
+    -------
+    tarefas: list
+        Lista das tarefas, agrupadas por entrada. Um mapa de limiares tem
+        uma única tarefa com as saídas de todas as varreduras, já que o
+        pontilhado ordenado não depende delas.
+    """
+    varreduras, dists = list(varreduras), list(dists)
+
+    tarefas: List[Tarefa] = []
+    for entrada in entradas:
+        out = os.path.basename(entrada)
+        m, _ = os.path.splitext(out)
+
+        for d in dists:
+            d = d.lower()
+            dist = por_nome(d)
+            grupos = [varreduras] if ordenado(dist) and varreduras else [[v] for v in varreduras]
+            for grupo in grupos:
+                if colorida:
+                    saidas = [
+                        caminho
+                        for v in grupo
+                        for caminho in (
+                            os.path.join(build, v.name, d, out),
+                            # cópias em outras pastas
+                            os.path.join(build, d, v.name, m + '.png'),
+                            os.path.join(build, d, m, v.name + '.png'),
+                            os.path.join(build, v.name, m, d + '.png'),
+                        )
+                    ]
+                    tarefas.append(Tarefa(entrada, cv2.IMREAD_COLOR, grupo[0], dist, saidas, paleta))
+
+                if not paleta.conjunta:
+                    saidas = [os.path.join(build, 'grayscale', v.name, d, out) for v in grupo]
+                    tarefas.append(Tarefa(entrada, cv2.IMREAD_GRAYSCALE, grupo[0], dist, saidas, paleta))
+    return tarefas
+
+
+# # # # # # # # # # # # # #
+# Execução das tarefas    #
+
+def pontilhado(img: Image, tarefa: Tarefa, perfil: Optional[Perfil]=None,
+               cache: Optional[Cache]=None) -> Image:
+    """
+    Aplica os meios-tons da tarefa e grava o resultado em todas as saídas.
+    Executada nas threads, os kernels liberam a GIL.
+
+    Parâmetros
+    ----------
+    img: np.ndarray
+        Imagem já decodificada.
+    tarefa: Tarefa
+        Descrição da aplicação.
+    perfil: Perfil, opcional
+        Registra o tempo das etapas `pontilhado`, `expansao` e `escrita`.
+    cache: Cache, opcional
+        Cache dos resultados, compartilhado com ``meios_tons``.
+
+    Retorno
+    -------
+    out: np.ndarray
+        Imagem resultante, já com os valores da paleta.
+
+    Erro
+    ----
+    ValueError
+        Quando o mapa de limiares é usado com outra quantização, ou a paleta
+        de cores com uma imagem em escala de cinza.
+    """
+    perfil = perfil or Perfil(memoria=False)
+    with perfil.etapa('pontilhado'):
+        if ordenado(tarefa.dist):
+            if tarefa.paleta is not BINARIA:
+                msg = 'pontilhado ordenado apenas com dois níveis'
+                raise ValueError(msg)
+            # mapa de limiares, sem as linhas em paralelo dentro das threads
+            calcula = lambda: pontilhado_ordenado(img, tarefa.dist, paralelo=False)
+        else:
+            # canais na mesma passada, o paralelismo fica entre as tarefas
+            calcula = lambda: tarefa.varredura(img, tarefa.dist, paleta=tarefa.paleta, paralelo=False)
+
+        if cache is None:
+            res = calcula()
+        else:
+            res = cache.aplica(calcula, img, tarefa.dist, tarefa.paleta, tarefa.varredura)
+
+    with perfil.etapa('expansao'):
+        # valores da paleta para a visualização, o alfa já está completo
+        res = tarefa.paleta.expande(res)
+
+    with perfil.etapa('escrita'):
+        for saida in tarefa.saidas:
+            pasta = os.path.dirname(saida)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            imgwrite(res, saida)
+    return res
+
+
+def executa_lote(tarefas: Iterable[Tarefa], threads: int=None, perfis: Optional[TextIO]=None,
+                 cache: Optional[Cache]=None) -> int:
+    """
+    Executa as tarefas em um pool limitado de threads. Cada entrada é lida e
+    decodificada uma única vez por modo de cor.
+
+    Parâmetros
+    ----------
+    tarefas: iterável de Tarefa
+        Tarefas a serem executadas. Entradas iguais devem estar agrupadas,
+        para não manter imagens decodificadas por muito tempo.
+    threads: int, opcional
+        Número máximo de threads. Por padrão, o número de CPUs.
+    perfis: arquivo de texto, opcional
+        Recebe uma linha JSON com o perfil de cada tarefa (ver ``lib.perfil``),
+        na ordem em que terminam. A leitura entra na primeira tarefa de cada
+        imagem. Sem a memória alocada, misturada entre as threads.
+    cache: Cache, opcional
+        Cache dos resultados (ver ``lib.cache``). Tarefas sem mudanças custam
+        a leitura da entrada, o hash e a leitura do resultado.
+
+    Retorno
+    -------
+    erros: int
+        Quantidade de tarefas que falharam, os erros são mostrados
+        na saída de erro. Qualquer erro de uma tarefa é contado, sem
+        interromper as demais.
+    """
+    threads = threads or os.cpu_count() or 1
+    # limite de tarefas em espera, segurando as imagens na memória
+    limite = 4 * threads
+
+    erros = 0
+    # perfil de cada tarefa pendente
+    medidas: Dict[Future, Tuple[Tarefa, Perfil]] = {}
+
+    def coleta(prontas: Iterable[Future]) -> None:
+        nonlocal erros
+        for fut in prontas:
+            tarefa, perfil = medidas.pop(fut)
+            try:
+                fut.result()
+            # mostra o erro, mas continua a execução
+            except (OSError, ValueError) as err:
+                print(err, file=sys.stderr)
+                erros += 1
+            # erros inesperados (do OpenCV ou falhas) também não param o lote
+            except Exception as err:
+                print(f'{tarefa.entrada}: {type(err).__name__}: {err}', file=sys.stderr)
+                erros += 1
+            else:
+                if perfis is not None:
+                    print(perfil.json(**descricao(tarefa)), file=perfis, flush=True)
+
+    # imagens decodificadas, apenas da entrada atual
+    imagens: Dict[Tuple[str, int], Optional[Image]] = {}
+    pendentes = set()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for tarefa in tarefas:
+            perfil = Perfil(memoria=False)
+            chave = (tarefa.entrada, tarefa.modo)
+            if chave not in imagens:
+                imagens = {k: v for k, v in imagens.items() if k[0] == tarefa.entrada}
+                try:
+                    with perfil.etapa('leitura'):
+                        imagens[chave] = imgread(tarefa.entrada, tarefa.modo)
+                # erro mostrado apenas uma vez por entrada
+                except (OSError, ValueError) as err:
+                    print(err, file=sys.stderr)
+                    imagens[chave] = None
+
+            img = imagens[chave]
+            if img is None:
+                erros += 1
+                continue
+
+            fut = pool.submit(pontilhado, img, tarefa, perfil, cache)
+            medidas[fut] = tarefa, perfil
+            pendentes.add(fut)
+            if len(pendentes) >= limite:
+                prontas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                coleta(prontas)
+
+        coleta(pendentes)
+    return erros
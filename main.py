@@ -1,5 +1,8 @@
-import sys, cv2, warnings
-from argparse import ArgumentParser, ArgumentTypeError
+import sys, cv2, warnings, shlex, time
+import numpy as np
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from glob import glob
+from typing import List, Optional
 if sys.version_info.major < 3 or sys.version_info.minor < 7:
     msg = """
 
@@ -8,9 +11,19 @@ if sys.version_info.major < 3 or sys.version_info.minor < 7:
     """
     warnings.warn(msg)
 
-from inout import imgread, imgwrite, imgshow
-from lib import meios_tons, Varredura, USANDO_NUMBA
-from dists import ERR_DIST, ErrorDist
+# importação da lib, com a compilação ou a carga dos kernels
+INICIO = time.perf_counter()
+from inout import imgread, imgwrite, imgwrite_bits, imgshow
+from lib import meios_tons, desempacota, Varredura, Motor, USANDO_NUMBA, FAIXA, SOBREPOSICAO, ORDENS
+from dists import ERR_DIST, DISTRIBUICOES, MAPAS, por_nome
+from lote import Tarefa, tarefas_build, executa_lote, descricao
+from metricas import metricas
+from fluxo import meios_tons_fluxo, LINHAS
+from lib.paletas import Paleta, BINARIA
+import lib.paletas as paletas
+from lib.perfil import Perfil
+from lib.cache import Cache, LIMITE
+IMPORTACAO = time.perf_counter() - INICIO
 if not USANDO_NUMBA:
     msg = """
 
@@ -24,15 +37,15 @@ if not USANDO_NUMBA:
 # # # # # # # # # # # # # # #
 # Tratamento dos argumentos #
 
-def dist_err(nome: str) -> ErrorDist:
+def dist_err(nome: str) -> str:
     """
-    Recuperação das distribuições de erro pré-definidas.
+    Checagem das distribuições de erro e mapas de limiares pré-definidos.
+    O nome é mantido para montar as pastas do modo em lote.
     """
-    try:
-        return ERR_DIST[nome.upper()]
-    except KeyError:
+    if nome.upper() not in ERR_DIST and nome.upper() not in MAPAS:
         msg = f'distribuição de erro inválida: {nome}'
         raise ArgumentTypeError(msg)
+    return nome.lower()
 
 def varredura(nome: str) -> Varredura:
     """
@@ -44,52 +57,270 @@ def varredura(nome: str) -> Varredura:
         msg = f'opção de varredura inválida: {nome}'
         raise ArgumentTypeError(msg)
 
+def quantizacao(nome: str) -> Paleta:
+    """
+    Processamento dos níveis ou da paleta de cores da saída.
+    """
+    try:
+        return paletas.por_nome(nome)
+    except (OSError, ValueError) as err:
+        raise ArgumentTypeError(str(err))
+
+def natural(texto: str) -> int:
+    """
+    Inteiro não negativo, como as alturas e a sobreposição das faixas,
+    limitado para caber nos inteiros de 32 bits dos kernels.
+    """
+    try:
+        valor = int(texto)
+    except ValueError:
+        msg = f'inteiro inválido: {texto}'
+        raise ArgumentTypeError(msg)
+    if not 0 <= valor < 2**31:
+        msg = f'valor fora do intervalo de 0 a {2**31 - 1}: {valor}'
+        raise ArgumentTypeError(msg)
+    return valor
+
+def motor(nome: str) -> Motor:
+    """
+    Processamento dos argumentos de motor de execução.
+    """
+    try:
+        return Motor[nome.lower()]
+    except KeyError:
+        msg = f'motor de execução inválido: {nome}'
+        raise ArgumentTypeError(msg)
+
 
 # parser de argumentos
 description = 'Ferramenta de aplicação de meios-tons para o Trabalho 2.'
-usage = '%(prog)s [OPTIONS] INPUT'
+usage = '%(prog)s [OPTIONS] INPUT\n       %(prog)s --lote DIR [OPTIONS] [INPUT ...]'
 
 parser = ArgumentParser(description=description, usage=usage, allow_abbrev=False)
 # argumentos necessários
-parser.add_argument('input', metavar='INPUT', type=str,
-                    help='imagem de entrada')
+parser.add_argument('input', metavar='INPUT', type=str, nargs='*',
+                    help='imagem de entrada (ou padrões glob no modo em lote)')
 # opções de saída
 parser.add_argument('-o', '--output', type=str, action='append', metavar='FILE',
                     help='arquivo para gravar o resultado')
 parser.add_argument('-f', '--force-show', action='store_true',
                     help='sempre mostra o resultado final em uma janela')
+parser.add_argument('-b', '--bits', action='store_true',
+                    help='resultado com 1 bit por pixel, gravado direto em PNG ou PBM de 1 bit '
+                         '(apenas em escala de cinza)')
 # configurações do pontilhado
 parser.add_argument('-g', '--grayscale', dest='modo', action='store_const',
                     default=cv2.IMREAD_COLOR, const=cv2.IMREAD_GRAYSCALE,
                     help='aplica meios-tons em imagem escala de cinza')
-parser.add_argument('-v', '--varredura',
-                    type=varredura, choices=Varredura, default=Varredura.alternada,
+parser.add_argument('-a', '--alfa', dest='modo', action='store_const', const=cv2.IMREAD_UNCHANGED,
+                    help='mantém o canal alfa de imagens BGRA, sem pontilhado')
+parser.add_argument('-v', '--varredura', action='append',
+                    type=varredura, choices=Varredura,
                     help='muda a forma de varredura da imagem (PADRÃO: alternada)')
-parser.add_argument('-d', '--distribuicao', dest='dist', type=dist_err, default='FLOYD_STEINBERG',
-                    help='muda a distribuição de erros do pontilhado (PADRÃO: FLOYD_STEINBERG)')
+parser.add_argument('-d', '--distribuicao', dest='dist', action='append', type=dist_err,
+                    help='muda a distribuição de erros do pontilhado (PADRÃO: FLOYD_STEINBERG), ou usa '
+                         'o pontilhado ordenado com um mapa de limiares: ' + ', '.join(MAPAS))
+parser.add_argument('-q', '--quantizacao', dest='paleta', type=quantizacao, default=BINARIA,
+                    metavar='PALETA',
+                    help='níveis por canal (ex.: 4), "web" para a paleta web-safe, cores RGB em '
+                         'hexadecimal (ex.: "#000000,#ff8000,#ffffff") ou um arquivo com as cores; '
+                         'paletas de cores apenas em imagens coloridas (PADRÃO: 2)')
+parser.add_argument('-e', '--motor', type=motor, choices=Motor, default=Motor.sequencial,
+                    help='forma de execução; "frente" paraleliza as linhas da varredura '
+                         'unidirecional com o mesmo resultado e "faixas" aplica faixas '
+                         'independentes em paralelo, aproximado (PADRÃO: sequencial)')
+parser.add_argument('--faixa', metavar='N', type=natural, default=FAIXA,
+                    help=f'altura das faixas do motor "faixas" (PADRÃO: {FAIXA})')
+parser.add_argument('--sobreposicao', metavar='N', type=natural, default=SOBREPOSICAO,
+                    help=f'linhas sobrepostas entre as faixas (PADRÃO: {SOBREPOSICAO})')
+parser.add_argument('--desvio', action='store_true',
+                    help='mostra o RMSE e o PSNR em relação ao motor sequencial')
+parser.add_argument('--ordens', metavar='DIR', type=str,
+                    help='grava as ordens de varredura em DIR, reaproveitadas entre execuções '
+                         'com imagens do mesmo tamanho')
+# imagens maiores que a memória
+parser.add_argument('--fluxo', action='store_true',
+                    help='lê e escreve PGM/PPM binários em faixas, com memória limitada '
+                         '(apenas varreduras horizontais)')
+parser.add_argument('--linhas', metavar='N', type=natural, default=LINHAS,
+                    help=f'altura das faixas no modo em fluxo (PADRÃO: {LINHAS})')
+# modo em lote
+parser.add_argument('-l', '--lote', metavar='DIR', type=str,
+                    help='gera as saídas no layout do build.sh em DIR, em um único processo; '
+                         '-v e -d podem ser repetidos (PADRÃO: todas as combinações, coloridas e '
+                         'em escala de cinza, ou só em escala de cinza com -g)')
+parser.add_argument('-m', '--manifesto', metavar='FILE', type=str, action='append',
+                    help='arquivo de tarefas, uma por linha, com as mesmas opções da linha de comando')
+parser.add_argument('--cache', metavar='DIR', type=str,
+                    help='reaproveita os resultados de execuções anteriores com a mesma entrada e as '
+                         'mesmas opções, guardados em DIR (exceto no modo em fluxo)')
+parser.add_argument('--cache-limite', metavar='MB', type=int, default=LIMITE >> 20,
+                    help='tamanho máximo do cache, removendo os resultados usados há mais tempo '
+                         '(PADRÃO: %(default)s)')
+parser.add_argument('--profile', metavar='FILE', type=str, nargs='?', const='-',
+                    help='registra o tempo e a memória de cada etapa, numa linha JSON por tarefa, '
+                         'adicionada ao fim de FILE (PADRÃO: saída de erro)')
+parser.add_argument('-j', '--threads', metavar='N', type=int,
+                    help='número de threads no modo em lote (PADRÃO: número de CPUs)')
+
+
+def tarefa(args: Namespace, ctx: str='') -> Tarefa:
+    """
+    Tarefa de uma execução simples, fora do modo em lote.
+    """
+    if len(args.input) != 1:
+        parser.error(f'{ctx}apenas uma imagem de entrada fora do modo em lote')
+    if len(args.varredura or ()) > 1 or len(args.dist or ()) > 1:
+        parser.error(f'{ctx}apenas uma varredura e uma distribuição fora do modo em lote')
+
+    v, = args.varredura or [Varredura.alternada]
+    d, = args.dist or ['FLOYD_STEINBERG']
+    return Tarefa(args.input[0], args.modo, v, por_nome(d), args.output or [], args.paleta)
+
+
+def registra(destino: Optional[str], perfil: Perfil, job: Tarefa, motor: Motor) -> None:
+    """
+    Adiciona a linha JSON do perfil ao destino do `--profile`, se houver.
+    """
+    if destino is None:
+        return
+    linha = perfil.json(**descricao(job), motor=motor.name, importacao_s=IMPORTACAO)
+    if destino == '-':
+        print(linha, file=sys.stderr, flush=True)
+    else:
+        with open(destino, 'a') as arquivo:
+            print(linha, file=arquivo)
+
+
+def manifesto(arquivo: str) -> List[Tarefa]:
+    """
+    Leitura de um arquivo de tarefas. Cada linha segue as opções da linha de
+    comando (ex.: `imagens/baboon.png -o saida.png -v hilbert -g`), linhas
+    vazias e comentários com `#` são ignorados.
+    """
+    tarefas = []
+    with open(arquivo) as linhas:
+        for num, linha in enumerate(linhas, 1):
+            argv = shlex.split(linha, comments=True)
+            if not argv:
+                continue
+
+            ctx = f'{arquivo}:{num}: '
+            args = parser.parse_intermixed_args(argv)
+            if not args.output:
+                parser.error(f'{ctx}tarefas do manifesto precisam de saída')
+            tarefas.append(tarefa(args, ctx))
+    return tarefas
 
 
 if __name__ == "__main__":
     args = parser.parse_intermixed_args()
+    ORDENS.diretorio = args.ordens
+    cache = None if args.cache is None else Cache(args.cache, args.cache_limite << 20)
+
+    # modo em lote
+    if args.lote is not None or args.manifesto:
+        # o lote já executa as tarefas em paralelo
+        if args.motor != Motor.sequencial:
+            parser.error('o modo em lote usa apenas o motor sequencial')
+
+        tarefas = []
+        for arquivo in args.manifesto or ():
+            tarefas.extend(manifesto(arquivo))
+
+        if args.lote is not None:
+            # padrões glob ainda não expandidos pelo shell
+            entradas = [arq for padrao in args.input for arq in sorted(glob(padrao)) or [padrao]]
+            varreduras = args.varredura or list(Varredura)
+            dists = args.dist or [nome.split('_')[0] for nome in DISTRIBUICOES]
+            colorida = args.modo != cv2.IMREAD_GRAYSCALE
+            tarefas.extend(tarefas_build(entradas, varreduras, dists, args.lote, colorida, args.paleta))
+        elif args.input:
+            parser.error('imagens de entrada só com --lote ou nas linhas do manifesto')
+
+        if args.profile is None:
+            erros = executa_lote(tarefas, args.threads, cache=cache)
+        elif args.profile == '-':
+            erros = executa_lote(tarefas, args.threads, sys.stderr, cache)
+        else:
+            with open(args.profile, 'a') as perfis:
+                erros = executa_lote(tarefas, args.threads, perfis, cache)
+        sys.exit(1 if erros else 0)
 
     # entrada
-    arquivo = args.input
-    img = imgread(arquivo, args.modo)
+    job = tarefa(args)
+    # etapas da execução, a memória só com `--profile`
+    perfil = Perfil(memoria=args.profile is not None)
+
+    # modo em fluxo, sem a imagem completa na memória
+    if args.fluxo:
+        if not job.saidas:
+            parser.error('o modo em fluxo precisa de um arquivo de saída')
+        try:
+            cinza = job.modo == cv2.IMREAD_GRAYSCALE
+            with perfil.etapa('fluxo'):
+                meios_tons_fluxo(job.entrada, job.saidas, job.dist, job.varredura, cinza,
+                                 args.linhas, job.paleta)
+        except (OSError, ValueError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+        registra(args.profile, perfil, job, args.motor)
+        sys.exit(0)
+    arquivo = job.entrada
+    try:
+        with perfil.etapa('leitura'):
+            img = imgread(arquivo, job.modo)
+    # imagem inválida ou com mais de 8 bits por canal, com `-a`
+    except ValueError as err:
+        parser.error(str(err))
 
     # aplica pontilhado
-    img = meios_tons(img, args.dist, args.varredura)
-    # range completo para a visualização
-    img *= 255
+    try:
+        res = meios_tons(img, job.dist, job.varredura, args.motor, args.faixa,
+                         args.sobreposicao, args.bits, job.paleta, perfil, cache)
+    except ValueError as err:
+        parser.error(str(err))
+
+    # resultado empacotado, gravado antes de expandir
+    if args.bits:
+        largura = img.shape[1]
+        with perfil.etapa('escrita'):
+            for output in job.saidas:
+                try:
+                    imgwrite_bits(res, largura, output)
+                except (OSError, ValueError) as err:
+                    print(err, file=sys.stderr)
+        with perfil.etapa('desempacota'):
+            res = desempacota(res, largura)
+
+    # qualidade em relação à execução sequencial, pixel a pixel e
+    # com um filtro passa-baixa, próximo do tom percebido
+    if args.desvio:
+        with perfil.etapa('desvio'):
+            ref = meios_tons(img, job.dist, job.varredura, paleta=job.paleta)
+            f, g = job.paleta.expande(ref), job.paleta.expande(res)
+            m = metricas(f, g)
+            print(f'RMSE: {m.rmse:.3f}, PSNR: {m.psnr:.3f} dB', file=sys.stderr)
+            # filtro em ponto flutuante, sem arredondar
+            fb = cv2.GaussianBlur(f.astype(np.float64), (0, 0), 2.0)
+            gb = cv2.GaussianBlur(g.astype(np.float64), (0, 0), 2.0)
+            m = metricas(fb, gb)
+            print(f'RMSE suavizado: {m.rmse:.3f}, PSNR suavizado: {m.psnr:.3f} dB', file=sys.stderr)
+    # valores da paleta para a visualização, o alfa já está completo
+    with perfil.etapa('expansao'):
+        img = job.paleta.expande(res)
 
     # saída
-    if args.output:
-        for output in args.output:
-            try:
-                imgwrite(img, output)
-            # em caso de erro, mostra o erro
-            # mas continua a execução
-            except ValueError as err:
-                print(err, file=sys.stderr)
-
-    if args.output is None or args.force_show:
+    if job.saidas and not args.bits:
+        with perfil.etapa('escrita'):
+            for output in job.saidas:
+                try:
+                    imgwrite(img, output)
+                # em caso de erro, mostra o erro
+                # mas continua a execução
+                except ValueError as err:
+                    print(err, file=sys.stderr)
+    registra(args.profile, perfil, job, args.motor)
+
+    if not job.saidas or args.force_show:
         imgshow(img, arquivo)
@@ -0,0 +1,383 @@
+"""
+Métricas de qualidade do pontilhado em relação à imagem original.
+
+Todas as estatísticas saem dos mesmos momentos (``lib.momentos``),
+calculados em uma única passada com somas inteiras e finalizados em
+ponto flutuante, sem o estouro da subtração de `uint8`. As métricas podem
+ser calculadas logo depois de ``meios_tons``, sem gravar nem decodificar
+o resultado, ou a partir das saídas já geradas pelo ``build.sh``.
+
+As métricas globais escondem onde uma varredura falha, como os artefatos
+da espiral e da Hilbert. Para isso, há também os mapas locais de SSIM e
+PSNR, em janelas deslizantes com custo constante por pixel.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os, sys, json, math
+from argparse import ArgumentParser, ArgumentTypeError
+import cv2
+import numpy as np
+
+from tipos import Image
+from inout import imgread
+from lib import Varredura
+from lib.momentos import momentos, mapas_locais, SOMA_F, SOMA_G, SOMA_FF, SOMA_GG, SOMA_FG, IGUAIS
+from lib.paletas import BINARIA
+from dists import ERR_DIST, DISTRIBUICOES, nome_de
+
+
+class Metricas(NamedTuple):
+    """
+    Comparação entre a imagem original `f` e o resultado `g`.
+
+    Atributos
+    ---------
+    rmse: float
+        Raiz do erro quadrático médio.
+    snr: float
+        Razão sinal-ruído, em dB, com a energia de `f` como sinal.
+    psnr: float
+        Razão sinal-ruído de pico, em dB, com o pico em 255.
+    corr: float
+        Correlação de Pearson.
+    cov: float
+        Covariância.
+    jaccard: float
+        Fração dos valores idênticos.
+    """
+    rmse: float
+    snr: float
+    psnr: float
+    corr: float
+    cov: float
+    jaccard: float
+
+
+def razao_db(num: float, den: float) -> float:
+    """
+    `10 log10(num / den)`, infinito com `den` nulo.
+    """
+    if den == 0:
+        return math.inf if num > 0 else math.nan
+    elif num == 0:
+        return -math.inf
+    return 10 * math.log10(num / den)
+
+
+def metricas(f: Image, g: Image) -> Metricas:
+    """
+    Todas as métricas de uma vez, a partir dos momentos conjuntos.
+
+    Parâmetros
+    ----------
+    f, g: np.ndarray
+        Imagens com as mesmas dimensões, a original e o resultado já com os
+        valores da paleta (ver ``Paleta.expande``). Com `uint8`, os momentos
+        são exatos. Outros tipos, como imagens filtradas, usam somas em
+        `float64` do NumPy.
+
+    Erro
+    ----
+    ValueError
+        Quando as dimensões são diferentes.
+    """
+    if f.shape != g.shape:
+        msg = f'dimensões diferentes: {f.shape} e {g.shape}'
+        raise ValueError(msg)
+
+    if f.dtype == np.uint8 and g.dtype == np.uint8:
+        somas = momentos(np.ascontiguousarray(f).ravel(), np.ascontiguousarray(g).ravel())
+        # inteiros do Python, sem estouro nas combinações
+        ordem = SOMA_F, SOMA_G, SOMA_FF, SOMA_GG, SOMA_FG, IGUAIS
+        sf, sg, sff, sgg, sfg, iguais = (int(somas[i]) for i in ordem)
+    else:
+        a, b = f.astype(np.float64).ravel(), g.astype(np.float64).ravel()
+        sf, sg, sff, sgg, sfg = (float(x) for x in (a.sum(), b.sum(), a @ a, b @ b, a @ b))
+        iguais = int(np.count_nonzero(a == b))
+    n = f.size
+
+    # soma de `(f - g)^2` e os momentos centrais, multiplicados por `n`
+    sdd = sff - 2 * sfg + sgg
+    vf, vg, cfg = n * sff - sf * sf, n * sgg - sg * sg, n * sfg - sf * sg
+
+    rmse = math.sqrt(sdd / n)
+    return Metricas(
+        rmse=rmse,
+        snr=razao_db(sff, sdd),
+        psnr=razao_db(255.0 ** 2 * n, sdd),
+        corr=cfg / math.sqrt(vf) / math.sqrt(vg) if vf > 0 and vg > 0 else math.nan,
+        cov=cfg / (n * n),
+        jaccard=iguais / n,
+    )
+
+
+# # # # # # # # # # # # # # #
+# Mapas locais              #
+
+# lado padrão da janela dos mapas locais
+JANELA = 7
+# percentis resumidos de cada mapa
+PERCENTIS = (1, 5, 25, 50, 75, 95, 99)
+# limite do PSNR local, para janelas idênticas
+PSNR_MAX = 100.0
+# faixa de cada mapa de calor
+ESCALA_SSIM = (0.0, 1.0)
+ESCALA_PSNR = (0.0, 20.0)
+
+
+def locais(f: Image, g: Image, janela: int=JANELA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mapas de SSIM e PSNR local, em janelas quadradas centradas em cada
+    pixel (veja ``lib.momentos.mapas_locais``).
+
+    Parâmetros
+    ----------
+    f, g: np.ndarray
+        Imagens `uint8` com as mesmas dimensões. Com cores, os mapas de cada
+        canal são combinados: média do SSIM e PSNR do erro médio.
+    janela: int, opcional
+        Lado da janela, ímpar.
+
+    Retorno
+    -------
+    ssim, psnr: np.ndarray
+        Mapas 2D em `float32`. O PSNR é limitado em `PSNR_MAX`.
+
+    Erro
+    ----
+    ValueError
+        Quando as dimensões são diferentes ou a janela não é ímpar.
+    """
+    if f.shape != g.shape:
+        msg = f'dimensões diferentes: {f.shape} e {g.shape}'
+        raise ValueError(msg)
+    if janela < 1 or janela % 2 == 0:
+        msg = f'janela deve ser ímpar e positiva: {janela}'
+        raise ValueError(msg)
+
+    if f.ndim == 2:
+        f, g = f[..., np.newaxis], g[..., np.newaxis]
+    H, W, C = f.shape
+    ssim, mse = np.zeros((H, W), dtype=np.float32), np.zeros((H, W), dtype=np.float32)
+    canal_ssim, canal_mse = np.empty_like(ssim), np.empty_like(mse)
+    for c in range(C):
+        fc, gc = np.ascontiguousarray(f[..., c]), np.ascontiguousarray(g[..., c])
+        mapas_locais(fc, gc, janela // 2, canal_ssim, canal_mse)
+        ssim += canal_ssim
+        mse += canal_mse
+    ssim /= C
+    mse /= C
+
+    minimo = 255.0 ** 2 * 10 ** (-PSNR_MAX / 10)
+    psnr = 10 * np.log10(255.0 ** 2 / np.maximum(mse, minimo))
+    return ssim, psnr.astype(np.float32)
+
+
+def resumo(mapa: np.ndarray) -> Dict[str, float]:
+    """
+    Média e percentis (`PERCENTIS`) de um mapa local.
+    """
+    valores = np.percentile(mapa, PERCENTIS)
+    return {'media': float(mapa.mean()), **{f'p{p}': float(v) for p, v in zip(PERCENTIS, valores)}}
+
+
+def mapa_de_calor(mapa: np.ndarray, escala: Tuple[float, float]) -> Image:
+    """
+    Mapa em cores (``cv2.COLORMAP_VIRIDIS``), com a faixa `escala` cortada
+    nos extremos, para comparar as saídas entre si.
+    """
+    menor, maior = escala
+    norm = np.clip((mapa - menor) / (maior - menor), 0, 1)
+    return cv2.applyColorMap(np.round(255 * norm).astype(np.uint8), cv2.COLORMAP_VIRIDIS)
+
+
+# # # # # # # # # # # # # # #
+# Tabelas                   #
+
+# nome de cada distribuição nas tabelas do relatório
+NOMES = {
+    'FLOYD_STEINBERG': 'Floyd e Steinberg',
+    'STEVENSON_ARCE': 'Stevenson e Arci',
+    'BURKES': 'Burkes',
+    'SIERRA': 'Sierra',
+    'STUCKI': 'Stucki',
+    'JARVIS_JUDICE_NINKE': 'Jarvis, Judice e Ninke',
+}
+
+
+def latex(resultados: List[Dict[str, Any]]) -> str:
+    """
+    Linhas da tabela do relatório, um bloco por varredura e distribuição
+    com uma linha por imagem: RMSE, SNR, PSNR e correlação.
+    """
+    blocos: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for res in resultados:
+        blocos.setdefault((res['varredura'], res['dist']), []).append(res)
+
+    linhas = []
+    for (varredura, dist), grupo in blocos.items():
+        if len({res['varredura'] for res in resultados}) > 1:
+            linhas.append(f'% {varredura}')
+        linhas.append(f'\\multirow{{{len(grupo)}}}{{*}}{{{NOMES.get(dist, dist)}}}')
+        for res in grupo:
+            valores = ' & '.join(f'{res[m]:.3f}' for m in ('rmse', 'snr', 'psnr', 'corr'))
+            linhas.append(f'& \\texttt{{{res["imagem"]}}} & {valores} \\\\')
+        linhas.append('\\midrule')
+    return '\n'.join(linhas)
+
+
+def finitos(res: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Registro com infinitos e NaN como `null`, para um JSON válido.
+    """
+    return {k: None if isinstance(v, float) and not math.isfinite(v) else v for k, v in res.items()}
+
+
+# # # # # # # # # # # # # # #
+# Execução                  #
+
+def caminho(build: str, nome: str, varredura: Varredura, dist: str, modo: int) -> str:
+    """
+    Arquivo de uma configuração na árvore do ``build.sh``.
+    """
+    pasta = dist.split('_')[0].lower()
+    if modo == cv2.IMREAD_GRAYSCALE:
+        return os.path.join(build, 'grayscale', varredura.name, pasta, nome)
+    return os.path.join(build, varredura.name, pasta, nome)
+
+
+def avalia(f: Image, nome: str, varredura: Varredura, dist: str, build: Optional[str],
+           modo: int, janela: Optional[int]=None, mapas: Optional[str]=None) -> Dict[str, Any]:
+    """
+    Métricas de uma configuração. Sem `build`, o pontilhado é aplicado na
+    hora, sem passar por nenhum arquivo. Com `janela`, inclui o resumo dos
+    mapas locais, e com `mapas`, grava os mapas de calor nessa pasta, na
+    mesma estrutura do `build`. Executada nas threads.
+    """
+    if build is None:
+        # canais na mesma passada, o paralelismo fica entre as configurações
+        g = BINARIA.expande(varredura(f, ERR_DIST[dist], paralelo=False))
+    else:
+        g = imgread(caminho(build, nome, varredura, dist, modo), modo)
+
+    res = {'imagem': nome, 'varredura': varredura.name, 'dist': dist, **metricas(f, g)._asdict()}
+    if janela is None:
+        return res
+
+    ssim, psnr = locais(f, g, janela)
+    res['ssim_local'], res['psnr_local'] = resumo(ssim), resumo(psnr)
+    if mapas is not None:
+        base, _ = os.path.splitext(caminho(mapas, nome, varredura, dist, modo))
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        for sufixo, mapa, escala in (('ssim', ssim, ESCALA_SSIM), ('psnr', psnr, ESCALA_PSNR)):
+            if not cv2.imwrite(f'{base}_{sufixo}.png', mapa_de_calor(mapa, escala)):
+                raise OSError(f'não foi possível gravar {base}_{sufixo}.png')
+    return res
+
+
+def avalia_todas(entradas: Iterable[str], varreduras: Iterable[Varredura], dists: Iterable[str],
+                 build: Optional[str]=None, modo: int=cv2.IMREAD_COLOR,
+                 threads: Optional[int]=None, janela: Optional[int]=None,
+                 mapas: Optional[str]=None) -> List[Dict[str, Any]]:
+    """
+    Métricas de todas as combinações, em um pool de threads. Cada imagem
+    original é decodificada uma única vez.
+
+    Retorno
+    -------
+    resultados: list
+        Um registro por combinação, agrupados por varredura e distribuição,
+        na ordem das entradas.
+    """
+    originais = {os.path.basename(arq): imgread(arq, modo) for arq in entradas}
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1) as pool:
+        futuros = [
+            pool.submit(avalia, f, nome, v, d, build, modo, janela, mapas)
+            for v in varreduras for d in dists for nome, f in originais.items()
+        ]
+        return [fut.result() for fut in futuros]
+
+
+def varreduras_em(build: str, modo: int) -> List[Varredura]:
+    """
+    Varreduras com saídas na árvore do ``build.sh``.
+    """
+    raiz = os.path.join(build, 'grayscale') if modo == cv2.IMREAD_GRAYSCALE else build
+    return [v for v in Varredura if os.path.isdir(os.path.join(raiz, v.name))]
+
+
+def varredura(nome: str) -> Varredura:
+    """
+    Varredura pelo nome, na linha de comando.
+    """
+    try:
+        return Varredura[nome.lower()]
+    except KeyError:
+        msg = f'opção de varredura inválida: {nome}'
+        raise ArgumentTypeError(msg)
+
+
+def distribuicao(nome: str) -> str:
+    """
+    Nome completo de uma distribuição de erros, a partir de qualquer nome
+    aceito pelo ``main.py`` (ex.: `floyd`).
+    """
+    if nome.upper() not in ERR_DIST:
+        msg = f'distribuição de erro inválida: {nome}'
+        raise ArgumentTypeError(msg)
+    return nome_de(ERR_DIST[nome.upper()])
+
+
+# parser de argumentos
+description = 'Métricas de qualidade do pontilhado, em tabelas LaTeX e JSON.'
+parser = ArgumentParser(description=description, allow_abbrev=False)
+parser.add_argument('input', metavar='INPUT', type=str, nargs='*',
+                    default=[f'imagens/{nome}.png' for nome in ('baboon', 'peppers', 'monalisa', 'watch')],
+                    help='imagens originais (PADRÃO: baboon, peppers, monalisa e watch)')
+parser.add_argument('-v', '--varredura', action='append', type=varredura,
+                    help='varreduras avaliadas, pode ser repetida (PADRÃO: alternada, ou todas'
+                         ' as encontradas com --build)')
+parser.add_argument('-d', '--distribuicao', dest='dist', action='append', type=distribuicao,
+                    help='distribuições avaliadas, pode ser repetida (PADRÃO: todas)')
+parser.add_argument('-g', '--grayscale', dest='modo', action='store_const',
+                    default=cv2.IMREAD_COLOR, const=cv2.IMREAD_GRAYSCALE,
+                    help='avalia em escala de cinza')
+parser.add_argument('-b', '--build', metavar='DIR', type=str,
+                    help='lê as saídas geradas pelo build.sh em DIR, em vez de aplicar o pontilhado')
+parser.add_argument('--locais', dest='janela', metavar='N', type=int, nargs='?', const=JANELA,
+                    help='inclui os percentis do SSIM e do PSNR locais, em janelas NxN (PADRÃO: %(const)s)')
+parser.add_argument('--mapas', metavar='DIR', type=str,
+                    help='grava os mapas de calor locais em DIR, na estrutura do build (implica --locais)')
+parser.add_argument('--json', metavar='FILE', type=str,
+                    help='grava também os registros em JSON, "-" para a saída padrão')
+parser.add_argument('-j', '--threads', metavar='N', type=int,
+                    help='número de threads (PADRÃO: número de CPUs)')
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.varredura:
+        varreduras = args.varredura
+    elif args.build is not None:
+        varreduras = varreduras_em(args.build, args.modo)
+    else:
+        varreduras = [Varredura.alternada]
+    dists = args.dist or DISTRIBUICOES
+    janela = args.janela if args.janela is not None or args.mapas is None else JANELA
+
+    try:
+        resultados = avalia_todas(args.input, varreduras, dists, args.build, args.modo,
+                                  args.threads, janela, args.mapas)
+    except (OSError, ValueError) as err:
+        print(err, file=sys.stderr)
+        sys.exit(1)
+
+    if args.json != '-':
+        print(latex(resultados))
+    if args.json is not None:
+        texto = json.dumps([finitos(res) for res in resultados], indent=2)
+        if args.json == '-':
+            print(texto)
+        else:
+            with open(args.json, 'w') as arquivo:
+                arquivo.write(texto + '\n')
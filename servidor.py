@@ -0,0 +1,320 @@
+"""
+Servidor de pontilhado, com os kernels da ``lib`` já carregados.
+
+Cada execução do ``main.py`` paga o início do interpretador, a importação
+do OpenCV e do Numba e a carga dos kernels antes do primeiro pixel. O
+servidor paga isso uma vez e atende as requisições HTTP, em localhost ou
+em um socket Unix, num pool de threads. Os kernels liberam a GIL, e cada
+tarefa usa os mesmos kernels sequenciais do modo em lote (ver ``lote``),
+sem paralelismo interno disputando as threads.
+
+Rotas
+-----
+POST /pontilhado
+    Imagem codificada no corpo, com as opções na query string: `dist`
+    (PADRÃO: floyd), `varredura` (alternada), `modo` (cor, cinza ou alfa),
+    `quantizacao` (2) e `formato` (png). Responde a imagem resultante.
+GET /pontilhado?caminho=ARQUIVO
+    O mesmo, com a imagem lida de um arquivo local.
+GET /estado
+    Contadores em JSON: requisições recebidas, na fila, em execução,
+    concluídas e com erro, e as latências recentes.
+
+Exemplo: `curl --data-binary @imagens/baboon.png -o saida.png
+'localhost:8920/pontilhado?varredura=hilbert&dist=stucki'`.
+"""
+from typing import Any, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit, parse_qs
+import os, sys, json, time, mimetypes, threading
+from argparse import ArgumentParser
+import numpy as np
+
+from inout import imgread, imgdecode, imgencode
+from lib import Varredura
+from lib.cache import Cache, LIMITE
+from lib.paletas import Paleta
+from lib.perfil import Perfil, compilacao
+import lib.paletas as paletas
+from lote import Tarefa, MODOS, pontilhado
+from dists import por_nome
+
+
+# # # # # # # # # # # # # # #
+# Contadores                #
+
+# latências mantidas para os percentis
+JANELA = 1000
+
+
+def percentis(valores: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    Média e percentis 50, 90 e 99 de uma série de latências, em segundos.
+    """
+    if valores.size == 0:
+        return {'media': None, 'p50': None, 'p90': None, 'p99': None}
+    p50, p90, p99 = np.percentile(valores, (50, 90, 99))
+    return {'media': float(valores.mean()), 'p50': float(p50), 'p90': float(p90), 'p99': float(p99)}
+
+
+class Contadores:
+    """
+    Estado das requisições, atualizado pelas threads do servidor e do pool.
+
+    Parâmetros
+    ----------
+    janela: int, opcional
+        Quantidade de requisições recentes nas latências.
+    """
+    def __init__(self, janela: int=JANELA):
+        self.trava = threading.Lock()
+        self.inicio = time.time()
+        self.recebidas = self.na_fila = self.executando = self.concluidas = self.erros = 0
+        # espera na fila, execução e total de cada requisição
+        self.latencias: deque = deque(maxlen=janela)
+
+    def entra(self) -> None:
+        with self.trava:
+            self.recebidas += 1
+            self.na_fila += 1
+
+    def comeca(self) -> None:
+        with self.trava:
+            self.na_fila -= 1
+            self.executando += 1
+
+    def termina(self, fila: float, execucao: float, ok: bool) -> None:
+        with self.trava:
+            self.executando -= 1
+            if ok:
+                self.concluidas += 1
+                self.latencias.append((fila, execucao, fila + execucao))
+            else:
+                self.erros += 1
+
+    def estado(self) -> Dict[str, Any]:
+        """
+        Contadores e percentis das latências recentes.
+        """
+        with self.trava:
+            latencias = np.array(self.latencias, dtype=np.float64).reshape(-1, 3)
+            return {
+                'ativo_s': time.time() - self.inicio,
+                'recebidas': self.recebidas,
+                'na_fila': self.na_fila,
+                'executando': self.executando,
+                'concluidas': self.concluidas,
+                'erros': self.erros,
+                'latencia': {
+                    'fila': percentis(latencias[:, 0]),
+                    'execucao': percentis(latencias[:, 1]),
+                    'total': percentis(latencias[:, 2]),
+                },
+            }
+
+
+# # # # # # # # # # # # # # #
+# Requisições               #
+
+# modos de leitura pelo nome
+LEITURA = {nome: modo for modo, nome in MODOS.items()}
+
+
+@lru_cache(maxsize=64)
+def quantizacao(nome: str) -> Paleta:
+    """
+    Paleta pelo nome, montada uma vez por descrição.
+    """
+    return paletas.por_nome(nome)
+
+
+def pedido(consulta: Dict[str, str]) -> Tuple[Tarefa, str]:
+    """
+    Tarefa e extensão de saída de uma requisição.
+
+    Erro
+    ----
+    ValueError
+        Quando alguma opção é inválida.
+    """
+    nome_dist = consulta.get('dist', 'floyd')
+    nome_varredura = consulta.get('varredura', 'alternada')
+    nome_modo = consulta.get('modo', 'cor')
+    try:
+        dist = por_nome(nome_dist)
+    except KeyError:
+        raise ValueError(f'distribuição de erro inválida: {nome_dist}')
+    try:
+        varredura = Varredura[nome_varredura.lower()]
+    except KeyError:
+        raise ValueError(f'opção de varredura inválida: {nome_varredura}')
+    if nome_modo not in LEITURA:
+        raise ValueError(f'modo de leitura inválido: {nome_modo}')
+    try:
+        paleta = quantizacao(consulta.get('quantizacao', '2'))
+    except OSError as err:
+        raise ValueError(str(err))
+
+    ext = '.' + consulta.get('formato', 'png').lower().lstrip('.')
+    entrada = consulta.get('caminho', '-')
+    return Tarefa(entrada, LEITURA[nome_modo], varredura, dist, [], paleta), ext
+
+
+class Servico:
+    """
+    Pool de threads que executa as tarefas, com os contadores.
+
+    Parâmetros
+    ----------
+    threads: int, opcional
+        Tarefas simultâneas. Por padrão, o número de CPUs.
+    cache: Cache, opcional
+        Cache dos resultados (ver ``lib.cache``).
+    """
+    def __init__(self, threads: Optional[int]=None, cache: Optional[Cache]=None):
+        self.pool = ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1)
+        self.contadores = Contadores()
+        self.cache = cache
+
+    def executa(self, tarefa: Tarefa, ext: str, dados: Optional[bytes], chegada: float) -> bytes:
+        """
+        Decodificação, pontilhado e codificação, dentro do pool.
+        """
+        inicio = time.perf_counter()
+        self.contadores.comeca()
+        ok = False
+        try:
+            if dados is None:
+                img = imgread(tarefa.entrada, tarefa.modo)
+            else:
+                img = imgdecode(dados, tarefa.modo)
+            res = pontilhado(img, tarefa, Perfil(memoria=False), self.cache)
+            saida = imgencode(res, ext)
+            ok = True
+            return saida
+        finally:
+            self.contadores.termina(inicio - chegada, time.perf_counter() - inicio, ok)
+
+    def atende(self, tarefa: Tarefa, ext: str, dados: Optional[bytes]) -> bytes:
+        """
+        Coloca a tarefa na fila e espera o resultado codificado.
+        """
+        self.contadores.entra()
+        return self.pool.submit(self.executa, tarefa, ext, dados, time.perf_counter()).result()
+
+
+class Requisicao(BaseHTTPRequestHandler):
+    """
+    Tratamento das rotas, com o ``Servico`` em `server.servico`.
+    """
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MeiosTons/1.0'
+
+    def responde(self, codigo: int, corpo: bytes, tipo: str) -> None:
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def erro(self, codigo: int, msg: str) -> None:
+        self.responde(codigo, (msg + '\n').encode(), 'text/plain; charset=utf-8')
+
+    def pontilhado(self, dados: Optional[bytes]) -> None:
+        url = urlsplit(self.path)
+        consulta = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            tarefa, ext = pedido(consulta)
+            if dados is None and tarefa.entrada == '-':
+                raise ValueError('sem imagem: envie no corpo ou use "caminho"')
+            saida = self.server.servico.atende(tarefa, ext, dados)
+        except ValueError as err:
+            return self.erro(400, str(err))
+        except OSError as err:
+            return self.erro(404, str(err))
+        tipo = mimetypes.types_map.get(ext, 'application/octet-stream')
+        self.responde(200, saida, tipo)
+
+    def do_GET(self) -> None:
+        rota = urlsplit(self.path).path
+        if rota == '/estado':
+            estado = {**self.server.servico.contadores.estado(), 'kernels': compilacao()}
+            self.responde(200, json.dumps(estado).encode(), 'application/json')
+        elif rota == '/pontilhado':
+            self.pontilhado(None)
+        else:
+            self.erro(404, f'rota inexistente: {rota}')
+
+    def do_POST(self) -> None:
+        rota = urlsplit(self.path).path
+        tamanho = int(self.headers.get('Content-Length', 0))
+        dados = self.rfile.read(tamanho)
+        if rota == '/pontilhado':
+            self.pontilhado(dados)
+        else:
+            self.erro(404, f'rota inexistente: {rota}')
+
+    def address_string(self) -> str:
+        # sem endereço no socket Unix
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verboso:
+            super().log_message(format, *args)
+
+
+class ServidorUnix(ThreadingMixIn, UnixStreamServer):
+    """
+    Servidor HTTP em um socket Unix, uma thread por conexão.
+    """
+    daemon_threads = True
+
+
+# parser de argumentos
+description = 'Servidor de pontilhado em HTTP, com os kernels carregados uma única vez.'
+parser = ArgumentParser(description=description, allow_abbrev=False)
+parser.add_argument('-p', '--porta', metavar='N', type=int, default=8920,
+                    help='porta em localhost (PADRÃO: %(default)s)')
+parser.add_argument('--host', type=str, default='127.0.0.1',
+                    help='endereço do servidor (PADRÃO: %(default)s)')
+parser.add_argument('-u', '--unix', metavar='SOCKET', type=str,
+                    help='atende em um socket Unix, em vez da porta')
+parser.add_argument('-j', '--threads', metavar='N', type=int,
+                    help='tarefas simultâneas no pool (PADRÃO: número de CPUs)')
+parser.add_argument('--cache', metavar='DIR', type=str,
+                    help='reaproveita os resultados guardados em DIR (ver main.py --cache)')
+parser.add_argument('--cache-limite', metavar='MB', type=int, default=LIMITE >> 20,
+                    help='tamanho máximo do cache (PADRÃO: %(default)s)')
+parser.add_argument('--verboso', action='store_true',
+                    help='mostra cada requisição na saída de erro')
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    cache = None if args.cache is None else Cache(args.cache, args.cache_limite << 20)
+
+    if args.unix is not None:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        servidor = ServidorUnix(args.unix, Requisicao)
+        endereco = args.unix
+    else:
+        servidor = ThreadingHTTPServer((args.host, args.porta), Requisicao)
+        endereco = f'http://{args.host}:{servidor.server_port}'
+    servidor.servico = Servico(args.threads, cache)
+    servidor.verboso = args.verboso
+
+    print(f'atendendo em {endereco}', file=sys.stderr, flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servidor.servico.pool.shutdown()
+        if args.unix is not None:
+            os.remove(args.unix)
@@ -0,0 +1,268 @@
+"""
+Suíte de benchmarks reprodutível, com o resultado em JSON.
+
+Cobre todas as varreduras e distribuições de erro, em escala de cinza e
+colorido, nas imagens de `imagens/` e em imagens sintéticas de alguns
+tamanhos, geradas sempre com a mesma semente. A compilação é medida à
+parte, importando a ``lib`` em processos novos, e as vazões são medidas
+com os kernels já carregados. Com `--base`, o resultado é comparado com
+uma execução anterior e as regressões são apontadas.
+"""
+from typing import Any, Dict, List, Optional
+from glob import glob
+import os, sys, json, platform, subprocess, tempfile
+from argparse import ArgumentParser
+import cv2
+import numpy as np
+
+from tipos import Image
+from inout import imgread
+from bench import mede
+from lib import meios_tons, Varredura, Motor, USANDO_NUMBA
+from dists import ERR_DIST, DISTRIBUICOES, por_nome
+
+
+# diretório do projeto, para os processos de compilação
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+# versão do formato do JSON
+VERSAO = 1
+
+
+# # # # # # # # # # # # # # #
+# Entradas                  #
+
+def sintetica(megapixels: float, colorida: bool, semente: int=0) -> Image:
+    """
+    Imagem quadrada com gradientes suaves e ruído, sempre a mesma para a
+    mesma semente.
+
+    Parâmetros
+    ----------
+    megapixels: float
+        Tamanho aproximado, o lado é arredondado.
+    colorida: bool
+        Com três canais BGR, com gradientes em direções diferentes.
+    semente: int, opcional
+        Semente do ruído.
+    """
+    lado = max(1, round((megapixels * 1e6) ** 0.5))
+    rng = np.random.default_rng(semente)
+    y, x = np.mgrid[0:lado, 0:lado] / max(lado - 1, 1)
+
+    canais = [x, y, (x + y) / 2] if colorida else [(x + y) / 2]
+    img = np.stack([255.0 * c + rng.normal(0.0, 16.0, c.shape) for c in canais], axis=-1)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    return img if colorida else img[..., 0]
+
+
+def entradas(padrao: str, tamanhos: List[float], colorida: bool) -> Dict[str, Image]:
+    """
+    Imagens da suíte, pelo nome usado no JSON: os arquivos do padrão glob,
+    em ordem, e as sintéticas de cada tamanho.
+    """
+    modo = cv2.IMREAD_COLOR if colorida else cv2.IMREAD_GRAYSCALE
+
+    imagens = {}
+    for arquivo in sorted(glob(padrao)) if padrao else ():
+        imagens[os.path.basename(arquivo)] = imgread(arquivo, modo)
+    for mp in tamanhos:
+        imagens[f'sintetica_{mp:g}mp'] = sintetica(mp, colorida)
+    return imagens
+
+
+# # # # # # # # # # # # # # #
+# Medidas                   #
+
+def compilacao() -> Optional[Dict[str, float]]:
+    """
+    Tempo para importar a ``lib`` em um processo novo, com um cache vazio
+    (compilando todos os kernels) e depois com o cache já gravado.
+    """
+    if not USANDO_NUMBA:
+        return None
+
+    def importa(cache: str) -> float:
+        env = dict(os.environ, NUMBA_CACHE_DIR=cache)
+        codigo = 'import time; t = time.perf_counter(); import lib; print(time.perf_counter() - t)'
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=env,
+                               check=True, capture_output=True, text=True)
+        return float(saida.stdout)
+
+    with tempfile.TemporaryDirectory() as cache:
+        fria = importa(cache)
+        carregada = importa(cache)
+    return {'compilacao_s': fria, 'cache_s': carregada}
+
+
+def casos(imagens: Dict[str, Image], repeticoes: int) -> List[Dict[str, Any]]:
+    """
+    Todas as combinações de imagem, varredura e distribuição de erro, no
+    motor sequencial.
+    """
+    resultado = []
+    for nome, img in imagens.items():
+        pixels = img.shape[0] * img.shape[1]
+        modo = 'cor' if img.ndim == 3 else 'cinza'
+        for varredura in Varredura:
+            for dist in DISTRIBUICOES:
+                medida = mede(lambda: meios_tons(img, ERR_DIST[dist], varredura), repeticoes)
+                resultado.append({
+                    'imagem': nome, 'modo': modo, 'altura': img.shape[0], 'largura': img.shape[1],
+                    'varredura': varredura.name, 'dist': dist, 'motor': Motor.sequencial.name,
+                    'mp_s': pixels / medida['melhor_s'] / 1e6, **medida,
+                })
+                print(f'{nome} {modo} {varredura.name} {dist}: {resultado[-1]["mp_s"]:.1f} MP/s',
+                      file=sys.stderr, flush=True)
+    return resultado
+
+
+def escalabilidade(img: Image, threads: List[int], repeticoes: int) -> List[Dict[str, Any]]:
+    """
+    Vazão dos kernels paralelos (motores ``frente`` e ``faixas``, os canais
+    em paralelo do motor sequencial e o pontilhado ordenado) com cada número
+    de threads do Numba.
+    """
+    if not USANDO_NUMBA:
+        return []
+    from numba import get_num_threads, set_num_threads
+
+    dist = ERR_DIST['FLOYD_STEINBERG']
+    aplicacoes = {
+        Motor.frente.name: lambda: meios_tons(img, dist, Varredura.unidirecional, Motor.frente),
+        Motor.faixas.name: lambda: meios_tons(img, dist, Varredura.alternada, Motor.faixas),
+        # padrão do main.py, com um canal de cor por thread
+        'canais': lambda: meios_tons(img, dist, Varredura.alternada),
+        'canais_hilbert': lambda: meios_tons(img, dist, Varredura.hilbert),
+        'ordenado': lambda: meios_tons(img, por_nome('bayer8'), Varredura.unidirecional),
+    }
+    pixels = img.shape[0] * img.shape[1]
+
+    resultado = []
+    original = get_num_threads()
+    try:
+        for nome, aplica in aplicacoes.items():
+            base = None
+            for n in threads:
+                set_num_threads(n)
+                medida = mede(aplica, repeticoes)
+                base = base or medida['melhor_s']
+                resultado.append({
+                    'motor': nome, 'threads': n, 'mp_s': pixels / medida['melhor_s'] / 1e6,
+                    'aceleracao': base / medida['melhor_s'], **medida,
+                })
+    finally:
+        set_num_threads(original)
+    return resultado
+
+
+def ambiente() -> Dict[str, Any]:
+    """
+    Versões e configuração da máquina, para saber se duas execuções são
+    comparáveis.
+    """
+    info = {
+        'python': platform.python_version(), 'numpy': np.__version__, 'opencv': cv2.__version__,
+        'plataforma': platform.platform(), 'processador': platform.processor(),
+        'cpus': os.cpu_count(), 'numba': None, 'threads_numba': None, 'commit': None,
+    }
+    if USANDO_NUMBA:
+        import numba
+        info['numba'] = numba.__version__
+        info['threads_numba'] = numba.config.NUMBA_NUM_THREADS
+    try:
+        saida = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True, text=True)
+        info['commit'] = saida.stdout.strip() or None
+    except OSError:
+        pass
+    return info
+
+
+# # # # # # # # # # # # # # #
+# Comparação                #
+
+def regressoes(base: Dict[str, Any], atual: Dict[str, Any], tolerancia: float) -> List[str]:
+    """
+    Casos com a vazão abaixo da base por mais que a `tolerancia` relativa.
+    Casos que não estão nas duas execuções são ignorados.
+    """
+    def chave(caso: Dict[str, Any]) -> tuple:
+        return caso['imagem'], caso['modo'], caso['varredura'], caso['dist'], caso['motor']
+
+    medidos = {chave(caso): caso for caso in atual['casos']}
+    encontradas = []
+    for caso in base['casos']:
+        novo = medidos.get(chave(caso))
+        if novo is None:
+            continue
+        elif novo['mp_s'] < caso['mp_s'] * (1 - tolerancia):
+            queda = 100 * (1 - novo['mp_s'] / caso['mp_s'])
+            encontradas.append(f'{" ".join(chave(caso))}: {caso["mp_s"]:.1f} -> '
+                               f'{novo["mp_s"]:.1f} MP/s (-{queda:.0f}%)')
+    return encontradas
+
+
+# parser de argumentos
+description = 'Suíte de benchmarks dos kernels de meios-tons, com o resultado em JSON.'
+parser = ArgumentParser(description=description, allow_abbrev=False)
+parser.add_argument('-o', '--output', metavar='FILE', type=str,
+                    help='arquivo JSON do resultado (PADRÃO: saída padrão)')
+parser.add_argument('-i', '--imagens', metavar='GLOB', type=str, default='imagens/*.png',
+                    help='imagens reais da suíte, vazio para nenhuma (PADRÃO: imagens/*.png)')
+parser.add_argument('-t', '--tamanhos', metavar='MP', type=float, nargs='*', default=[0.25, 1.0, 4.0],
+                    help='tamanhos das imagens sintéticas, em megapixels (PADRÃO: 0.25 1 4)')
+parser.add_argument('-r', '--repeticoes', metavar='N', type=int, default=3,
+                    help='repetições de cada medida (PADRÃO: 3)')
+parser.add_argument('-g', '--grayscale', action='store_true',
+                    help='apenas em escala de cinza')
+parser.add_argument('--threads', metavar='N', type=int, nargs='*',
+                    help='números de threads na escalabilidade, nenhum para pular '
+                         '(PADRÃO: potências de 2 até NUMBA_NUM_THREADS)')
+parser.add_argument('--sem-compilacao', action='store_true',
+                    help='não mede a compilação, que leva dezenas de segundos')
+parser.add_argument('--base', metavar='FILE', type=str,
+                    help='JSON de uma execução anterior; termina com erro se houver regressão')
+parser.add_argument('--tolerancia', metavar='T', type=float, default=0.1,
+                    help='queda relativa da vazão aceita em relação à base (PADRÃO: 0.1)')
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if not USANDO_NUMBA:
+        print('aviso: executando sem o Numba', file=sys.stderr)
+
+    threads = args.threads
+    if threads is None and USANDO_NUMBA:
+        from numba import config
+        threads = [1 << k for k in range(config.NUMBA_NUM_THREADS.bit_length())]
+        if threads[-1] != config.NUMBA_NUM_THREADS:
+            threads.append(config.NUMBA_NUM_THREADS)
+
+    resultado = {
+        'versao': VERSAO,
+        'ambiente': ambiente(),
+        'compilacao': None if args.sem_compilacao else compilacao(),
+        'repeticoes': args.repeticoes,
+        'casos': [],
+        'escalabilidade': [],
+    }
+    for colorida in (False,) if args.grayscale else (False, True):
+        imagens = entradas(args.imagens, args.tamanhos, colorida)
+        resultado['casos'].extend(casos(imagens, args.repeticoes))
+    if threads:
+        # colorida, para os canais em paralelo do motor sequencial
+        maior = sintetica(max(args.tamanhos or [1.0]), not args.grayscale)
+        resultado['escalabilidade'] = escalabilidade(maior, threads, args.repeticoes)
+
+    texto = json.dumps(resultado, indent=2)
+    if args.output:
+        with open(args.output, 'w') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+
+    if args.base:
+        with open(args.base) as arquivo:
+            encontradas = regressoes(json.load(arquivo), resultado, args.tolerancia)
+        for regressao in encontradas:
+            print(f'regressão: {regressao}', file=sys.stderr)
+        sys.exit(1 if encontradas else 0)